@@ -1,15 +1,41 @@
 import streamlit as st
 import time
 import pandas as pd
+import numpy as np
 import requests
 import hashlib
 import re
 import urllib3
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from urllib3.util.connection import allowed_gai_family
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-from io import BytesIO
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from io import BytesIO, StringIO
+import gzip
+import csv
+import codecs
+from itertools import islice
+from collections import deque
 import socket
+import ipaddress
+from bisect import bisect_right
+import os
+import json
+import sqlite3
+from email.utils import parsedate_to_datetime
+import threading
+import queue
+import heapq
+from array import array
+from datetime import date
+import multiprocessing
+import importlib.machinery
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from page_analyzer import process_page, NearDuplicateIndex, FieldDuplicateIndex, TemplateIndex, DEFAULT_DUP_THRESHOLD
 
 # --- Level 0: 页面基础配置 ---
 st.set_page_config(
@@ -19,6 +45,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Streamlit 以伪造的 __main__ 模块执行本脚本 (__spec__ 为空), forkserver/spawn 启动的分析子进程会据此重跑整个页面脚本;
+# 声明为 "__main__" 模块后子进程跳过这一步, 只导入 page_analyzer
+if __name__ == "__main__":
+    __spec__ = importlib.machinery.ModuleSpec("__main__", None, origin=__file__)
+
 # 禁用 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -41,21 +72,6 @@ def is_valid_url(url):
     except:
         return False
 
-def get_content_hash(text):
-    return hashlib.md5(text.encode('utf-8')).hexdigest()
-
-def estimate_pixel_width(text, font_size=18):
-    if not text: return 0
-    width = 0
-    for char in text:
-        if ord(char) > 127: 
-            width += font_size
-        elif char.isupper():
-            width += font_size * 0.7 
-        else:
-            width += font_size * 0.55 
-    return width
-
 def get_browser_headers():
     return {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -63,35 +79,107 @@ def get_browser_headers():
         'Connection': 'keep-alive',
     }
 
-def fetch_psi_data(url, api_key):
-    if not api_key: return None
-    endpoint = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url}&key={api_key}&strategy=mobile"
+# 本地状态目录: HTTP 缓存、断点、审计结果与导入的离线 IP 库 (不纳入版本库)
+STATE_DIR = ".audit_state"
+
+# 离线 IP 归属地库: CSV 每行 "起始,结束,国家代码[,国家名]" (IP 字符串或整数, 兼容 DB-IP / IP2Location Lite),
+# 或 "网段,国家代码[,国家名]" (CIDR); 未安装时回退到 ip-api.com 在线查询
+GEOIP_DB_PATH = os.environ.get("SEO_AUDIT_GEOIP", os.path.join(STATE_DIR, "geoip.csv"))
+IPV4_MAX = 2 ** 32 - 1
+IPV4_MAPPED = 0xFFFF00000000 # ::ffff:0.0.0.0, IP2Location IPv6 库以此段收录 IPv4 地址
+
+def parse_ip_int(value):
+    value = value.strip()
+    return int(value) if value.isdigit() else int(ipaddress.ip_address(value))
+
+class GeoIPTable:
+    # 按起始地址排序的 IP 段, bisect 定位; IPv4 用 array('Q'), IPv6 超出 64 位只能用 list
+    def __init__(self, rows):
+        countries, index = [], {}
+        ranges = {4: [], 6: []}
+        for start, end, version, code, name in rows:
+            if code not in index:
+                index[code] = len(countries)
+                countries.append((code, name or code))
+            ranges[version].append((start, end, index[code]))
+        self.countries = countries
+        self.tables = {}
+        for version, items in ranges.items():
+            items.sort()
+            make = (lambda v: array('Q', v)) if version == 4 else list
+            self.tables[version] = (make(s for s, _, _ in items), make(e for _, e, _ in items), array('H', (c for _, _, c in items)))
+
+    @classmethod
+    def load(cls, path):
+        def rows():
+            with open(path, newline='', encoding='utf-8', errors='replace') as f:
+                for row in csv.reader(f):
+                    try:
+                        if '/' in row[0]:
+                            net = ipaddress.ip_network(row[0].strip(), strict=False)
+                            start, end, version, rest = int(net.network_address), int(net.broadcast_address), net.version, row[1:]
+                        else:
+                            start, end, rest = parse_ip_int(row[0]), parse_ip_int(row[1]), row[2:]
+                            version = 4 if ':' not in row[0] and end <= IPV4_MAX else 6
+                        if version == 6 and IPV4_MAPPED <= start and end <= IPV4_MAPPED + IPV4_MAX:
+                            start, end, version = start - IPV4_MAPPED, end - IPV4_MAPPED, 4
+                        code = rest[0].strip().upper()
+                    except (ValueError, IndexError):
+                        continue # 表头或格式错误的行
+                    if len(code) != 2 or code in ("ZZ", "--"): continue
+                    yield start, end, version, code, rest[1].strip() if len(rest) > 1 else None
+        return cls(rows())
+
+    def lookup(self, ip):
+        addr = ipaddress.ip_address(ip)
+        if addr.version == 6 and addr.ipv4_mapped: addr = addr.ipv4_mapped
+        starts, ends, cids = self.tables[addr.version]
+        value = int(addr)
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]: return self.countries[cids[i]]
+        return None
+
+_geoip_lock = threading.Lock()
+_geoip_table = {}
+_host_locations = {}
+
+def get_geoip_table(path=GEOIP_DB_PATH):
+    # 按文件修改时间缓存, 重新导入后自动生效
+    try: mtime = os.path.getmtime(path)
+    except OSError: return None
+    with _geoip_lock:
+        cached = _geoip_table.get(path)
+        if cached and cached[0] == mtime: return cached[1]
+        table = GeoIPTable.load(path)
+        _geoip_table[path] = (mtime, table)
+        return table
+
+def check_server_location(url, session=None):
+    # 每个主机名只解析一次; 查询失败不缓存, 以便下次重试
+    host = urlparse(url).hostname
+    if not host: return None, None
+    with _geoip_lock:
+        if host in _host_locations: return _host_locations[host]
     try:
-        response = requests.get(endpoint, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            crux = data.get('loadingExperience', {}).get('metrics', {})
-            if not crux: return {"error": "No CrUX data available"}
-            return {
-                "LCP": crux.get('LARGEST_CONTENTFUL_PAINT_MS', {}).get('percentile', 0) / 1000,
-                "CLS": crux.get('CUMULATIVE_LAYOUT_SHIFT_SCORE', {}).get('percentile', 0) / 100,
-                "INP": crux.get('INTERACTION_TO_NEXT_PAINT', {}).get('percentile', 0),
-                "FCP": crux.get('FIRST_CONTENTFUL_PAINT_MS', {}).get('percentile', 0) / 1000,
-            }
-        else: return {"error": f"API Error: {response.status_code}"}
-    except Exception as e: return {"error": str(e)}
-
-def check_server_location(url):
-    try:
-        domain = urlparse(url).netloc
-        ip = socket.gethostbyname(domain)
-        response = requests.get(f"http://ip-api.com/json/{ip}", timeout=3)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("countryCode", "Unknown"), data.get("country", "Unknown")
-    except:
-        pass
-    return None, None
+        ips = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(host, None)))
+    except OSError:
+        return None, None
+    table = get_geoip_table()
+    result = None
+    if table:
+        result = next((hit for hit in map(table.lookup, ips) if hit), None)
+    else:
+        session = session or create_http_session(pool_size=1)
+        try:
+            response = session.get(f"http://ip-api.com/json/{ips[0]}", timeout=3)
+            if response.status_code == 200 and response.json().get("countryCode"):
+                data = response.json()
+                result = data["countryCode"], data.get("country", data["countryCode"])
+        except Exception:
+            pass
+    if not result: return None, None
+    with _geoip_lock: _host_locations[host] = result
+    return result
 
 # --- Level 2: 排序与配置常量 ---
 CATEGORY_ORDER = ["access", "indexability", "technical", "content", "image_ux", "cwv_performance"]
@@ -99,16 +187,18 @@ SEVERITY_ORDER = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
 
 ISSUE_PRIORITY_LIST = [
     "no_robots", "robots_bad_rule", "robots_quality_issue", "baidu_robots_missing", "robots_no_sitemap", "no_sitemap", "sitemap_invalid",
-    "http_5xx", "http_4xx", "soft_404", "http_3xx",
-    "server_not_in_china",
-    "duplicate", "missing_canonical", "hreflang_invalid", "hreflang_no_default", "missing_hreflang",
-    "missing_viewport", "missing_jsonld", "js_links", "url_underscore", "url_uppercase",
+    "http_5xx", "http_4xx", "soft_404", "http_3xx", "crawl_trap", "orphan_page",
+    "server_not_in_china", "server_location_unknown",
+    "duplicate", "missing_canonical", "canonical_broken", "canonical_redirect", "canonical_chain", "hreflang_invalid", "hreflang_no_return", "hreflang_no_default", "missing_hreflang",
+    "page_too_large", "missing_viewport", "missing_jsonld", "js_links", "url_underscore", "url_uppercase",
     "missing_baidu_stats", "missing_baidu_verify", "missing_applicable_device", "missing_no_transform", "missing_icp", "content_not_chinese",
-    "missing_title", "short_title", "long_title", "missing_desc", "short_desc", "missing_h1", "missing_keywords", 
+    "missing_title", "short_title", "long_title", "duplicate_title", "missing_desc", "short_desc", "duplicate_meta_desc", "missing_h1", "duplicate_h1", "missing_keywords", 
     "no_favicon", "missing_alt", "alt_bad_quality", "anchor_bad_quality", 
     "lcp_issue", "inp_issue", "cls_issue", "fcp_issue", "fcp_baidu_issue", "cls_risk"
 ]
 
+DUPLICATE_GROUP_IDS = {"duplicate", "duplicate_title", "duplicate_meta_desc", "duplicate_h1"}
+
 def get_issue_priority(issue_id):
     try: return ISSUE_PRIORITY_LIST.index(issue_id)
     except ValueError: return 999 
@@ -132,6 +222,9 @@ TRANSLATIONS = {
         "psi_api_help": "建议填入以获取 LCP/CLS/INP 真实数据。留空则只进行代码审计。",
         "psi_list_url_label": "产品列表页 URL (可选)",
         "psi_detail_url_label": "产品详情页 URL (可选)",
+        "psi_strategies_label": "测试设备 (Strategy)",
+        "psi_urls_label": "其他需测试的 URL (可选, 每行一个)",
+        "psi_urls_help": "结果按 URL 与设备缓存 7 天, 重复审计不会消耗 API 配额。",
         "psi_get_key": "没有 API Key? [点击这里免费申请](https://developers.google.com/speed/docs/insights/v5/get-started)",
         "psi_fetching": "正在调用 Google API 获取 {} 数据...",
         "psi_success": "成功获取真实用户数据！",
@@ -145,10 +238,29 @@ TRANSLATIONS = {
         "check_robots_label": "检查并遵循 Robots.txt 规则", 
         "crawl_sitemap_label": "自动抓取 Robots.txt 中的 Sitemap", 
         "baidu_mode_label": "启用百度 SEO 审计模式", 
+        "concurrency_label": "并发抓取数",
+        "resume_label": "断点续爬",
+        "resume_help": "抓取进度定期保存到本地，中断或刷新后以相同设置重新开始即可从断点继续。",
+        "resume_info": "已从断点恢复：{} 个已分析页面，{} 个待抓取链接。",
+        "http_cache_label": "启用 HTTP 缓存 (复审增量抓取)",
+        "http_cache_help": "缓存页面及 ETag/Last-Modified，再次审计时发送条件请求，未变化的页面 (304) 直接复用上次的内容与分析结果。",
+        "max_page_mb_label": "单页 HTML 大小上限 (MB)",
+        "ignore_trailing_slash_label": "忽略 URL 末尾斜杠",
+        "ignore_case_label": "忽略 URL 路径大小写",
+        "trap_limit_label": "单一 URL 模式抓取上限",
+        "trap_limit_help": "日历、分面筛选等同一模式的 URL 最多抓取的数量，超出部分视为爬虫陷阱并跳过。",
+        "per_host_limit_label": "单域名并发上限",
+        "analysis_workers_label": "页面分析进程数",
+        "dup_threshold_label": "近似重复相似度阈值",
+        "dup_threshold_help": "基于 SimHash 指纹的相似度，达到该值的页面归入同一重复簇。1.0 表示仅检测完全相同的内容。",
+        "analysis_workers_help": "HTML 解析与规则检查在多个进程中并行执行，与抓取同时进行。设为 1 则在主进程内分析。",
         "allow_subdomains_label": "允许抓取子域名 (如 blog.site.com)",
         "allow_outside_folder_label": "允许抓取父级目录 (如从 /en/ 开始抓取 /fr/)",
         "manual_sitemaps": "手动 Sitemap 地址 (每行一个, 补充用)", 
         "manual_pages_label": "手动添加页面列表 (每行一个 URL)",
+        "url_list_label": "批量 URL 列表文件 (列表模式)",
+        "url_list_help": "支持 txt / CSV / Sitemap XML (可为 .gz)。上传后只审计文件中的 URL，不再发现新链接，也不受最大页面数限制，适合网站迁移前后的 URL 核查。",
+        "spinner_list": "正在按列表审计 URL ({})...",
         "sitemap_content_label": "粘贴 Sitemap XML 内容 (直接解析)",
         "start_btn": "开始深度爬取",
         "error_url": "网址格式错误",
@@ -164,10 +276,20 @@ TRANSLATIONS = {
         "chart_issues": "问题类型分布",
         "chart_no_issues": "未发现明显问题。",
         "chart_status": "HTTP Status Codes",
+        "crawl_rate_title": "自适应抓取速率",
+        "dns_title": "DNS 解析",
+        "dns_caption": "{}: 实际解析 {} 次 (平均 {:.1f} ms), 缓存命中 {} 次, 失败 {} 次",
+        "geoip_label": "导入离线 IP 归属地库 (CSV, 百度模式)",
+        "geoip_help": "每行 \"起始IP,结束IP,国家代码[,国家名]\" 或 \"网段,国家代码\", 兼容 DB-IP / IP2Location Lite 国家库。导入后无需联网即可识别服务器位置。",
+        "geoip_loaded": "已加载离线 IP 归属地库: {} 个 IP 段",
+        "template_title": "页面模板 (按 URL 模式与页面结构聚类)",
+        "template_caption": "同一模板的页面共享代码, 修复一次即可覆盖该模板下的全部页面。PSI 测速按模板抽样。",
+        "crawl_rate_caption": "{}: 稳定在 {:.2f} 次/秒 (共请求 {} 次, 被限流 {} 次)",
         "cwv_title": "首页核心 Web 指标 (Core Web Vitals) - 真实数据",
         "cwv_source": "数据来源: Google Chrome User Experience Report (CrUX) - 仅首页",
         "matrix_header": "爬取数据明细 (Big Sheet)",
         "download_csv": "下载 CSV 报告",
+        "matrix_page_label": "页码 (共 {} 页)",
         "ppt_header": "演示文稿预览 (Pitch Deck Mode)",
         "ppt_success_no_issues": "无严重问题。",
         "ppt_download_header": "📥 导出报告",
@@ -219,6 +341,10 @@ TRANSLATIONS = {
         "http_4xx": "死链/客户端错误 (4xx)", "http_4xx_desc": "内部链接返回 404 (未找到) 或 403 (禁止访问) 错误。", "http_4xx_impact": "严重破坏用户体验，中断权重传递路径，并可能导致已索引的页面被 Google 移除。", "http_4xx_sugg": "移除死链，或者将其重定向到最相关的有效页面。",
         "http_5xx": "服务器错误 (5xx)", "http_5xx_desc": "服务器响应 500/502/503 等内部错误。", "http_5xx_impact": "表明服务器极其不稳定，Googlebot 会因此降低对该站点的爬取频率以减轻负载。", "http_5xx_sugg": "检查服务器错误日志，优化数据库查询或升级服务器配置。",
         "hreflang_invalid": "Hreflang 格式错误", "hreflang_invalid_desc": "语言代码不符合 ISO 639-1 标准 (如使用了 {} 等错误格式)。", "hreflang_invalid_impact": "Google 无法识别目标语言，导致国际化定位失效。", "hreflang_invalid_sugg": "使用标准的 ISO 语言代码 (例如 'en-US' 而不是 'en_US')。",
+        "hreflang_no_return": "Hreflang 缺少回链", "hreflang_no_return_desc": "页面声明的备选语言版本没有反向指向本页：{}。", "hreflang_no_return_impact": "Google 要求 hreflang 双向确认，缺少回链的声明会被忽略，导致用户被分配到错误的语言版本。", "hreflang_no_return_sugg": "确保同一组的每个语言版本都互相声明全部 hreflang（包括自身），页面与 Sitemap 中的声明保持一致。",
+        "canonical_broken": "Canonical 指向错误页面", "canonical_broken_desc": "Canonical 目标 {} 返回状态码 {}。", "canonical_broken_impact": "搜索引擎会忽略无效的 Canonical，重复页面无法合并权重，甚至可能导致首选页面不被收录。", "canonical_broken_sugg": "将 Canonical 指向可正常访问 (200) 的首选 URL。",
+        "canonical_redirect": "Canonical 指向跳转页面", "canonical_redirect_desc": "Canonical 目标 {} 发生了重定向。", "canonical_redirect_impact": "向搜索引擎发出相互矛盾的信号，浪费爬取预算，Canonical 可能被忽略。", "canonical_redirect_sugg": "将 Canonical 直接指向重定向后的最终 URL。",
+        "canonical_chain": "Canonical 链", "canonical_chain_desc": "Canonical 目标本身又指向其他页面：{}。", "canonical_chain_impact": "搜索引擎不保证会沿 Canonical 链继续追踪，首选页面可能无法被正确识别。", "canonical_chain_sugg": "让所有重复页面的 Canonical 直接指向最终的首选 URL。",
         "hreflang_no_default": "Hreflang 缺失 x-default", "hreflang_no_default_desc": "Missing 'x-default' fallback attribute.", "hreflang_no_default_impact": "当用户来自未指定的语言/地区时，可能无法自动匹配到最合适的通用版本（通常是英语）。", "hreflang_no_default_sugg": "添加 hreflang='x-default' 标签，指定默认的语言版本。",
         "alt_bad_quality": "图片 Alt 质量差", "alt_bad_quality_desc": "Alt 文本使用了无意义词汇（如 image1.jpg, photo）或过短。", "alt_bad_quality_impact": "搜索引擎无法理解图片内容，错失图片搜索流量，且对视障用户极不友好。", "alt_bad_quality_sugg": "使用描述性文本准确描述图片内容，包含相关的关键词。",
         "anchor_bad_quality": "锚文本质量差", "anchor_bad_quality_desc": "使用了“点击这里”、“更多”等通用词汇作为链接文本。", "anchor_bad_quality_impact": "无法向搜索引擎传递目标页面的关键词相关性，降低了目标页面的排名潜力。", "anchor_bad_quality_sugg": "使用描述性 keywords in the anchor text.",
@@ -228,6 +354,9 @@ TRANSLATIONS = {
         "long_title": "标题过长", "long_title_desc": "标题超过建议显示宽度 (约 {} px)。", "long_title_impact": "标题将在搜索结果中被截断，降低可读性和点击率。", "long_title_sugg": "精简标题长度，将核心信息前置，控制在 600 px 以内。",
         "missing_desc": "缺失元描述", "missing_desc_desc": "页面未包含 <meta name='description'> 标签。", "missing_desc_impact": "Google will generate a snippet from page text, which is often irrelevant and lowers CTR.", "missing_desc_sugg": "添加吸引人的元描述，概括页面内容并包含号召性用语。",
         "short_desc": "元描述过短", "short_desc_desc": "内容过少 (约 {} px)，吸引力不足。", "short_desc_impact": "无法充分展示页面卖点，在搜索结果中缺乏竞争力。", "short_desc_sugg": "扩充描述至 400-920 px，提供更多有价值的信息。",
+        "duplicate_title": "标题重复", "duplicate_title_desc": "多个页面使用了完全相同的 <title>。", "duplicate_title_impact": "搜索引擎难以区分这些页面的主题，容易造成关键词内部竞争，并降低搜索结果点击率。", "duplicate_title_sugg": "为每个页面撰写独特的标题，突出该页面特有的产品、分类或主题信息。",
+        "duplicate_meta_desc": "元描述重复", "duplicate_meta_desc_desc": "多个页面使用了完全相同的元描述。", "duplicate_meta_desc_impact": "重复的描述无法体现页面差异，Google 往往会忽略并自动生成摘要，降低点击率。", "duplicate_meta_desc_sugg": "为重要页面撰写独立的元描述；批量页面可基于模板加入产品名、价格等差异化字段。",
+        "duplicate_h1": "H1 重复", "duplicate_h1_desc": "多个页面使用了完全相同的 H1 标题。", "duplicate_h1_impact": "页面主题信号趋同，削弱各页面与目标关键词的相关性。", "duplicate_h1_sugg": "确保每个页面的 H1 准确描述该页面独有的内容。",
         "missing_h1": "缺失 H1 标签", "missing_h1_desc": "页面缺乏 <h1> 主标题。", "missing_h1_impact": "搜索引擎难以理解内容的层级结构和核心主题，降低了关键词的相关性权重。", "missing_h1_sugg": "确保每个页面有且仅有一个 H1 标签，概括当前页面的主题。",
         "missing_viewport": "缺失移动端视口配置", "missing_viewport_desc": "未配置 <meta name='viewport'> 标签。", "missing_viewport_impact": "在移动设备上显示异常（字体极小）。Google 移动优先索引会严重惩罚此类页面。", "missing_viewport_sugg": "在 <head> 中添加标准的 viewport meta 标签。",
         "missing_canonical": "缺失 Canonical 标签", "missing_canonical_desc": "未指定规范链接。", "missing_canonical_impact": "无法应对 URL 参数（如 ?id=1）导致的重复内容问题，容易造成权重稀释。", "missing_canonical_sugg": "在所有页面添加自引用（Self-referencing）或指向原件的 Canonical 标签。",
@@ -238,6 +367,10 @@ TRANSLATIONS = {
         "js_links": "发现 JS 伪链接", "js_links_desc": "使用了 href='javascript:...' 形式的链接。", "js_links_impact": "爬虫无法跟踪此类链接，导致内部链接断裂，深层页面变成“孤岛”。", "js_links_sugg": "使用标准的 <a href> 标签，仅在 onclick 事件中处理 JS 逻辑。",
         "url_underscore": "URL 包含下划线", "url_underscore_desc": "URL 路径中使用下划线 (_) 分隔单词。", "url_underscore_impact": "Google 建议使用连字符。下划线可能导致关键词无法被正确切分（被视为一个长单词）。", "url_underscore_sugg": "在 URL 结构中使用连字符 (-) 代替下划线。",
         "url_uppercase": "URL 包含大写字母", "url_uppercase_desc": "URL 路径中混用了大写字母。", "url_uppercase_impact": "服务器通常区分大小写，极易造成一页多址（Duplicate Content）和 404 错误。", "url_uppercase_sugg": "强制所有 URL 使用小写字母。",
+        "crawl_trap": "疑似爬虫陷阱", "crawl_trap_desc": "URL 模式 {} 产生大量近似地址，已跳过 {} 个链接。", "crawl_trap_impact": "日历、分面筛选、会话参数等可生成无限 URL，大量消耗搜索引擎爬取预算并产生重复内容。", "crawl_trap_sugg": "对筛选/日历链接使用 nofollow 或 robots.txt 屏蔽，并为参数页设置 Canonical 指向主页面。",
+        "orphan_page": "孤立页面", "orphan_page_desc": "共 {} 个 Sitemap 中的页面没有任何站内链接指向。", "orphan_page_impact": "孤立页面无法通过站内链接被发现，也得不到内部权重传递，收录与排名都会受影响。", "orphan_page_sugg": "在相关分类页、导航或正文中添加指向这些页面的链接；已废弃的页面应从 Sitemap 中移除。",
+        "server_location_unknown": "无法识别服务器归属地", "server_location_unknown_desc": "未能解析域名或查询 IP 归属地, 服务器位置检查已跳过。", "server_location_unknown_impact": "无法确认服务器是否位于中国大陆, 百度抓取速度与备案要求无从评估。", "server_location_unknown_sugg": "在高级设置中导入离线 IP 归属地库 (CSV), 或检查 DNS 解析是否正常。",
+        "page_too_large": "页面 HTML 体积过大", "page_too_large_desc": "HTML 文档超过 {} MB 上限，仅分析了前半部分内容。", "page_too_large_impact": "Googlebot 只处理 HTML 的前 15 MB，超出部分的内容和链接不会被索引，且加载缓慢。", "page_too_large_sugg": "精简内联脚本/样式与冗余标记，对长列表进行分页，确保 HTML 体积合理。",
         
         # Baidu specific
         "missing_keywords": "Missing Meta Keywords (Baidu)",
@@ -296,6 +429,9 @@ TRANSLATIONS = {
         "psi_api_help": "Enter API Key to fetch Real User Metrics (LCP, CLS, INP) for the home page. Leave empty for code-only check.",
         "psi_list_url_label": "Product List URL (Optional)", 
         "psi_detail_url_label": "Product Detail URL (Optional)", 
+        "psi_strategies_label": "Test Devices (Strategy)",
+        "psi_urls_label": "Additional URLs to Test (Optional, one per line)",
+        "psi_urls_help": "Results are cached per URL and device for 7 days, so repeated audits do not consume API quota.",
         "psi_get_key": "No API Key? [Get one for free here](https://developers.google.com/speed/docs/insights/v5/get-started)",
         "psi_fetching": "Fetching real CWV data from Google API ({}) ...",
         "psi_success": "Real user data fetched successfully!",
@@ -310,10 +446,29 @@ TRANSLATIONS = {
         "check_robots_label": "Check & Respect Robots.txt", 
         "crawl_sitemap_label": "Parse Sitemap from Robots.txt", 
         "baidu_mode_label": "Enable Baidu SEO Audit Mode", 
+        "concurrency_label": "Concurrent Fetches",
+        "resume_label": "Resume Interrupted Crawls",
+        "resume_help": "Crawl progress is checkpointed to disk. Restart with the same settings after an interruption to continue where it stopped.",
+        "resume_info": "Resumed from checkpoint: {} pages analyzed, {} URLs queued.",
+        "http_cache_label": "Enable HTTP Cache (Incremental Re-audits)",
+        "http_cache_help": "Stores pages with their ETag/Last-Modified and revalidates them on the next audit. Unchanged pages (304) reuse the cached body and analysis results.",
+        "max_page_mb_label": "Max HTML Size per Page (MB)",
+        "ignore_trailing_slash_label": "Ignore Trailing Slash in URLs",
+        "ignore_case_label": "Ignore URL Path Case",
+        "trap_limit_label": "Max URLs per Pattern",
+        "trap_limit_help": "Maximum URLs crawled for one calendar/faceted-filter pattern. The rest are treated as a crawler trap and skipped.",
+        "per_host_limit_label": "Max Concurrency per Host",
+        "analysis_workers_label": "Analysis Processes",
+        "dup_threshold_label": "Near-Duplicate Similarity Threshold",
+        "dup_threshold_help": "SimHash similarity at which pages are grouped into the same duplicate cluster. 1.0 only matches identical content.",
+        "analysis_workers_help": "HTML parsing and rule checks run in parallel worker processes, overlapping with fetching. Set to 1 to analyze in the main process.",
         "allow_subdomains_label": "Allow Subdomains (e.g. blog.site.com)", 
         "allow_outside_folder_label": "Allow Outside Start Folder (e.g. /fr/ from /en/)", 
         "manual_sitemaps": "Manual Sitemap URLs (One per line, Optional)", 
         "manual_pages_label": "Manual Pages to Audit (One per line)",
+        "url_list_label": "Bulk URL List File (List Mode)",
+        "url_list_help": "txt / CSV / Sitemap XML (optionally .gz). Only the URLs in the file are audited: link discovery is off and Max Pages does not apply. Useful for checking migration URL lists.",
+        "spinner_list": "Auditing URL list ({})...",
         "sitemap_content_label": "Paste Sitemap XML Content (Direct Parse)",
         "start_btn": "Start Deep Crawl",
         "error_url": "Invalid URL format",
@@ -330,11 +485,21 @@ TRANSLATIONS = {
         "chart_issues": "Issue Distribution",
         "chart_no_issues": "No significant issues found.",
         "chart_status": "HTTP Status Codes",
+        "crawl_rate_title": "Adaptive Crawl Rate",
+        "dns_title": "DNS Resolution",
+        "dns_caption": "{}: {} lookups (avg {:.1f} ms), {} cache hits, {} failures",
+        "geoip_label": "Import Offline IP-to-Country Database (CSV, Baidu Mode)",
+        "geoip_help": "One \"start_ip,end_ip,country_code[,country_name]\" or \"network,country_code\" per line; DB-IP and IP2Location Lite country CSVs work as-is. Server location is then detected without network access.",
+        "geoip_loaded": "Offline IP-to-country database loaded: {} ranges",
+        "template_title": "Page Templates (clustered by URL pattern and page structure)",
+        "template_caption": "Pages of one template share code, so one fix covers every page of that template. PSI speed tests are sampled per template.",
+        "crawl_rate_caption": "{}: settled at {:.2f} req/s ({} requests, throttled {} times)",
         "cwv_title": "Core Web Vitals - Real User Data (Home Only)",
         "cwv_source": "Source: Google Chrome User Experience Report (CrUX)",
         
         "matrix_header": "Crawled Data Matrix",
         "download_csv": "Download CSV Report",
+        "matrix_page_label": "Page (of {})",
         
         "ppt_header": "Pitch Deck Preview",
         "ppt_success_no_issues": "No critical issues found.",
@@ -428,7 +593,7 @@ TRANSLATIONS = {
         "no_favicon_sugg": "Create a .ico or .png icon and link it in the <head> section.",
         
         "duplicate": "Duplicate Content", 
-        "duplicate_desc": "Identical content detected across multiple URLs without proper canonicalization.", 
+        "duplicate_desc": "Identical or near-identical content detected across multiple URLs without proper canonicalization.", 
         "duplicate_impact": "Causes keyword cannibalization and dilutes link equity, preventing both pages from ranking well.", 
         "duplicate_sugg": "Select a preferred URL and use rel='canonical' tags on duplicate versions to point to it.",
         
@@ -452,6 +617,26 @@ TRANSLATIONS = {
         "hreflang_invalid_impact": "Google cannot identify the target language, causing international targeting to fail.", 
         "hreflang_invalid_sugg": "Use standard ISO codes (e.g., 'en-US' instead of 'en_US').",
         
+        "hreflang_no_return": "Hreflang Missing Return Links", 
+        "hreflang_no_return_desc": "Alternate versions do not link back to this page: {}.", 
+        "hreflang_no_return_impact": "Google requires hreflang to be confirmed in both directions; one-way annotations are ignored and users may get the wrong language version.", 
+        "hreflang_no_return_sugg": "Make every page in a language group reference all versions (including itself), and keep page and sitemap annotations consistent.",
+        
+        "canonical_broken": "Canonical Points to Error Page", 
+        "canonical_broken_desc": "The canonical target {} returns status {}.", 
+        "canonical_broken_impact": "Search engines ignore invalid canonicals, so duplicates are not consolidated and the preferred page may not be indexed.", 
+        "canonical_broken_sugg": "Point the canonical to the preferred URL that returns 200.",
+        
+        "canonical_redirect": "Canonical Points to Redirect", 
+        "canonical_redirect_desc": "The canonical target {} redirects.", 
+        "canonical_redirect_impact": "Sends conflicting signals to search engines and wastes crawl budget; the canonical may be ignored.", 
+        "canonical_redirect_sugg": "Point the canonical directly to the final URL after the redirect.",
+        
+        "canonical_chain": "Canonical Chain", 
+        "canonical_chain_desc": "The canonical target itself canonicalizes to another page: {}.", 
+        "canonical_chain_impact": "Search engines do not guarantee they will follow canonical chains, so the preferred page may not be identified.", 
+        "canonical_chain_sugg": "Point the canonical of every duplicate directly at the final preferred URL.",
+        
         "hreflang_no_default": "No x-default", 
         "hreflang_no_default_desc": "Missing 'x-default' fallback attribute.", 
         "hreflang_no_default_impact": "Users from unspecified regions may be served the wrong language version.", 
@@ -497,6 +682,21 @@ TRANSLATIONS = {
         "short_desc_impact": "Fails to provide enough context to entice users to click.", 
         "short_desc_sugg": "Expand the description to 400-920px with a call to action.",
         
+        "duplicate_title": "Duplicate Title", 
+        "duplicate_title_desc": "The same <title> is used on multiple pages.", 
+        "duplicate_title_impact": "Search engines struggle to tell the pages apart, causing keyword cannibalization and lower CTR.", 
+        "duplicate_title_sugg": "Write a unique title for every page that highlights its specific product, category or topic.",
+        
+        "duplicate_meta_desc": "Duplicate Description", 
+        "duplicate_meta_desc_desc": "The same meta description is used on multiple pages.", 
+        "duplicate_meta_desc_impact": "Duplicate descriptions do not differentiate pages; Google often ignores them and generates its own snippet.", 
+        "duplicate_meta_desc_sugg": "Write unique descriptions for key pages; for templated pages, include distinguishing fields such as product name or price.",
+        
+        "duplicate_h1": "Duplicate H1", 
+        "duplicate_h1_desc": "The same H1 heading is used on multiple pages.", 
+        "duplicate_h1_impact": "Pages send the same topical signal, weakening each page's relevance for its target keywords.", 
+        "duplicate_h1_sugg": "Make sure each page's H1 accurately describes the content unique to that page.",
+        
         "missing_h1": "Missing H1", 
         "missing_h1_desc": "No <h1> heading tag found.", 
         "missing_h1_impact": "Search engines struggle to identify the main topic of the page.", 
@@ -547,6 +747,21 @@ TRANSLATIONS = {
         "url_uppercase_impact": "Can lead to duplicate content issues on case-sensitive servers.", 
         "url_uppercase_sugg": "Force all URLs to be lowercase.",
         
+        "crawl_trap": "Possible Crawler Trap", 
+        "crawl_trap_desc": "URL pattern {} generates a large number of similar URLs; {} links were skipped.", 
+        "crawl_trap_impact": "Calendars, faceted filters and session parameters can produce infinite URLs, wasting crawl budget and creating duplicate content.", 
+        "crawl_trap_sugg": "Block filter/calendar URLs via robots.txt or nofollow, and canonicalize parameter pages to the main page.",
+        
+        "page_too_large": "Oversized HTML Page", 
+        "page_too_large_desc": "The HTML document exceeds the {} MB limit; only the beginning of the page was analyzed.", 
+        "page_too_large_impact": "Googlebot only processes the first 15 MB of HTML. Content and links beyond that are not indexed, and the page loads slowly.", 
+        "page_too_large_sugg": "Trim inline scripts/styles and redundant markup, and paginate long lists to keep the HTML size reasonable.",
+
+        "orphan_page": "Orphan Pages", 
+        "orphan_page_desc": "{} pages listed in the sitemap are not linked from any crawled page.", 
+        "orphan_page_impact": "Orphan pages cannot be discovered through internal links and receive no internal link equity, hurting indexing and rankings.", 
+        "orphan_page_sugg": "Link to these pages from relevant category pages, navigation or body content, and remove retired pages from the sitemap.",
+        
         # Baidu
         "missing_keywords": "Missing Meta Keywords (Baidu)",
         "missing_keywords_desc": "No <meta name='keywords'> tag found.",
@@ -583,10 +798,1117 @@ TRANSLATIONS = {
         "server_not_in_china": "Server Not In China (Baidu)",
         "server_not_in_china_desc": "Server IP detected in: {}. Baidu prefers mainland China hosting.",
         "server_not_in_china_impact": "Slow cross-border loading may cause Baidu spider timeouts.",
-        "server_not_in_china_sugg": "Migrate hosting to Mainland China and get ICP filing."
+        "server_not_in_china_sugg": "Migrate hosting to Mainland China and get ICP filing.",
+        "server_location_unknown": "Server Location Unknown (Baidu)",
+        "server_location_unknown_desc": "The domain could not be resolved or its IP could not be geolocated, so the server location check was skipped.",
+        "server_location_unknown_impact": "Without the hosting country, Baidu crawl speed and ICP filing requirements cannot be assessed.",
+        "server_location_unknown_sugg": "Import an offline IP-to-country database (CSV) under Advanced Settings, or check DNS resolution."
     }
 }
 
+# --- Level 4: 并发抓取引擎 (Fetch Layer) ---
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_ANALYSIS_WORKERS = min(8, os.cpu_count() or 1)
+# 每个分析进程最多积压的待分析页面数; 积压满时暂停派发新的抓取, 避免页面正文在内存与进程池队列中无限堆积
+ANALYSIS_BACKLOG_PER_WORKER = 4
+MAX_CACHE_BODY = 10 * 1024 * 1024
+DEFAULT_MAX_PAGE_MB = 5
+STREAM_CHUNK = 64 * 1024
+# 分析规则变更时递增, 使缓存中的旧分析结果失效
+ANALYSIS_VERSION = 5
+# 429/503 交给 HostThrottle 按 Retry-After 退避, 不在传输层盲目重试
+HTTP_RETRY_STATUSES = (500, 502, 504)
+THROTTLE_STATUSES = (429, 503)
+MAX_THROTTLE_RETRIES = 2
+DEFAULT_HOST_RATE = 5.0
+MIN_HOST_RATE = 0.2
+MAX_HOST_RATE = 50.0
+MAX_RETRY_AFTER = 60
+FAST_LATENCY = 0.5
+SLOW_LATENCY = 2.0
+DNS_TTL = 300
+DNS_NEGATIVE_TTL = 30
+DNS_PREFETCH_WORKERS = 4
+DNS_MAX_ENTRIES = 4096
+
+class DNSCache:
+    # 进程级 DNS 缓存: 包装 socket.getaddrinfo, requests/urllib3 与站点检查都经过这里;
+    # 按 (主机, 地址族, 类型, 协议, 标志) 缓存, 命中时只替换端口; 只有域名不存在 (EAI_NONAME) 短时间负缓存,
+    # 临时失败 (EAI_AGAIN 等) 下次照常解析. 记录、统计与预解析集合都以 DNS_MAX_ENTRIES 封顶
+    def __init__(self, resolve, ttl=DNS_TTL, negative_ttl=DNS_NEGATIVE_TTL, max_entries=DNS_MAX_ENTRIES):
+        self._resolve = resolve
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {}
+        self._prefetch_pool = None
+        self._prefetched = {}
+
+    def _bounded_put(self, table, key, value, now):
+        # 调用方持锁. 写入前先清掉已过期的记录, 仍然满额时按写入顺序淘汰最早的
+        table.pop(key, None)
+        if len(table) >= self.max_entries:
+            for k in [k for k, v in table.items() if v[0] <= now]: del table[k]
+            for k in list(islice(table, len(table) - self.max_entries + 1)): del table[k]
+        table[key] = value
+
+    def _record(self, host, hit, elapsed=0.0, failed=False):
+        with self._lock:
+            s = self._stats.get(host)
+            if s is None:
+                if len(self._stats) >= self.max_entries: del self._stats[next(iter(self._stats))]
+                s = self._stats[host] = [0, 0, 0, 0.0]
+            s[0 if hit else 1] += 1
+            if failed: s[2] += 1
+            s[3] += elapsed
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        if port is not None and not isinstance(port, int) and not str(port).isdigit():
+            return self._resolve(host, port, family, type, proto, flags) # 服务名端口 ("https") 不缓存
+        port = int(port or 0)
+        key = (host, family, type, proto, flags)
+        with self._lock: entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._record(host, True)
+            if isinstance(entry[1], socket.gaierror): raise socket.gaierror(*entry[1].args)
+            return [(f, t, p, c, (sa[0], port) + tuple(sa[2:])) for f, t, p, c, sa in entry[1]]
+        started = time.perf_counter()
+        try:
+            result = self._resolve(host, port, family, type, proto, flags)
+        except socket.gaierror as e:
+            self._record(host, False, time.perf_counter() - started, failed=True)
+            if e.errno == socket.EAI_NONAME:
+                now = time.monotonic()
+                with self._lock: self._bounded_put(self._entries, key, (now + self.negative_ttl, e), now)
+            raise
+        self._record(host, False, time.perf_counter() - started)
+        now = time.monotonic()
+        with self._lock: self._bounded_put(self._entries, key, (now + self.ttl, result), now)
+        return result
+
+    def prefetch(self, host, port=443):
+        # 新发现的子域名在后台预解析, 调用参数与 urllib3 建连时一致 (allowed_gai_family(), SOCK_STREAM) 以便命中;
+        # 同一主机在缓存有效期内只预解析一次, 过期后再次发现时重新预解析
+        now = time.monotonic()
+        with self._lock:
+            if not host or self._prefetched.get(host, (0,))[0] > now: return
+            self._bounded_put(self._prefetched, host, (now + self.ttl,), now)
+            if self._prefetch_pool is None:
+                self._prefetch_pool = ThreadPoolExecutor(max_workers=DNS_PREFETCH_WORKERS, thread_name_prefix="dns")
+        self._prefetch_pool.submit(self._prefetch_one, host, port)
+
+    def _prefetch_one(self, host, port):
+        try: self.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError: pass
+
+    def snapshot(self):
+        with self._lock: return {h: tuple(s) for h, s in self._stats.items()}
+
+    def stats(self, since=None):
+        # 每个主机: 缓存命中次数、实际解析次数、失败次数、平均解析耗时 (毫秒)
+        since = since or {}
+        out = {}
+        for host, s in self.snapshot().items():
+            prev = since.get(host, (0, 0, 0, 0.0))
+            hits, lookups, failures, elapsed = (a - b for a, b in zip(s, prev))
+            if hits or lookups:
+                out[host] = {"hits": hits, "lookups": lookups, "failures": failures, "avg_ms": elapsed * 1000 / lookups if lookups else 0.0}
+        return out
+
+def install_dns_cache():
+    # Streamlit 每次交互都会重新执行脚本, 缓存实例挂在 socket 模块上, 只包装一次并跨审计复用
+    cache = getattr(socket, "_audit_dns_cache", None)
+    if cache is None:
+        cache = DNSCache(socket.getaddrinfo)
+        socket._audit_dns_cache = cache
+        socket.getaddrinfo = cache.getaddrinfo
+    return cache
+
+DNS_CACHE = install_dns_cache()
+
+def create_http_session(pool_size=DEFAULT_CONCURRENCY, retries=2, backoff=0.5):
+    # 每次审计共用一个连接池, 复用 keep-alive 与 TLS 会话
+    session = requests.Session()
+    session.headers.update(get_browser_headers())
+    retry = Retry(
+        total=retries, connect=retries, read=retries, status=retries,
+        backoff_factor=backoff, status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=False, raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class HostLimiter:
+    def __init__(self, per_host_limit=DEFAULT_PER_HOST_LIMIT):
+        self.per_host_limit = max(1, int(per_host_limit))
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def slot(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._slots[host]
+
+class ResponseCache:
+    # 按 URL 持久化响应体与 ETag/Last-Modified, 复审时发送条件请求, 304 直接复用缓存与分析结果
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY, status INTEGER, final_url TEXT, history TEXT, headers TEXT, body BLOB,
+                etag TEXT, last_modified TEXT, fetched_at REAL, analysis_sig TEXT, analysis TEXT
+            )
+        """)
+
+    @classmethod
+    def open(cls):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        return cls(os.path.join(STATE_DIR, "http_cache.sqlite"))
+
+    def get(self, url):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, final_url, history, headers, body, etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if not row: return None
+        keys = ["status", "final_url", "history", "headers", "body", "etag", "last_modified"]
+        return dict(zip(keys, row))
+
+    def store(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified): return
+        if getattr(response, 'truncated', False) or getattr(response, 'skipped', False): return
+        if len(response.content) > MAX_CACHE_BODY: return
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL)",
+                (url, response.status_code, response.url, json.dumps([r.url for r in response.history]),
+                 json.dumps(dict(response.headers)), response.content, etag, last_modified, time.time())
+            )
+
+    def to_response(self, entry):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.url = entry["final_url"]
+        response.headers = CaseInsensitiveDict(json.loads(entry["headers"]))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = entry["body"]
+        for hop_url in json.loads(entry["history"]):
+            hop = requests.Response()
+            hop.status_code, hop.url = 301, hop_url
+            response.history.append(hop)
+        response.from_cache = True
+        return response
+
+    def get_analysis(self, url, sig):
+        with self._lock:
+            row = self.conn.execute("SELECT analysis FROM responses WHERE url = ? AND analysis_sig = ?", (url, sig)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def store_analysis(self, url, sig, analysis):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE responses SET analysis_sig = ?, analysis = ? WHERE url = ?", (sig, json.dumps(analysis, default=str), url))
+
+    def close(self):
+        self.conn.close()
+
+def read_body(response, max_bytes=None, html_only=False):
+    # 先看响应头: 非 HTML 不读取正文直接断开, HTML 最多读取 max_bytes
+    response.truncated = response.skipped = False
+    if html_only and 'text/html' not in response.headers.get('Content-Type', '').lower():
+        response.close()
+        response._content = b""
+        response.skipped = True
+        return response
+    chunks, size = [], 0
+    for chunk in response.iter_content(STREAM_CHUNK):
+        chunks.append(chunk)
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            response.truncated = True
+            break
+    response.close()
+    body = b"".join(chunks)
+    response._content = body[:max_bytes] if response.truncated else body
+    return response
+
+class ChunkStream:
+    # 把 iter_content 的分块包装成只读文件对象, 供 iterparse / GzipFile 边下载边消费
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b""
+
+    def _fill(self, n):
+        while n < 0 or len(self._buf) < n:
+            chunk = next(self._chunks, None)
+            if chunk is None: break
+            self._buf += chunk
+
+    def peek(self, n):
+        self._fill(n)
+        return self._buf[:n]
+
+    def read(self, n=-1):
+        self._fill(n if n is not None else -1)
+        if n is None or n < 0: n = len(self._buf)
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+def cached_get(session, url, cache=None, max_bytes=None, html_only=False, **kwargs):
+    kwargs["stream"] = True
+    entry = cache.get(url) if cache else None
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry:
+        if entry["etag"]: headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]: headers["If-Modified-Since"] = entry["last_modified"]
+    response = session.get(url, headers=headers, **kwargs)
+    if response.status_code == 304 and entry:
+        response.close()
+        return cache.to_response(entry)
+    read_body(response, max_bytes, html_only)
+    if cache: cache.store(url, response)
+    return response
+
+def parse_crawl_delay(robots_text, agents=("*",)):
+    delay = None
+    group, in_rules = [], False
+    for line in robots_text.splitlines():
+        line = line.split('#')[0].strip()
+        if ':' not in line: continue
+        key, value = [x.strip() for x in line.split(':', 1)]
+        key = key.lower()
+        if key == 'user-agent':
+            if in_rules: group, in_rules = [], False
+            group.append(value.lower())
+        else:
+            in_rules = True
+            if key == 'crawl-delay' and any(a in group for a in agents):
+                try: delay = float(value)
+                except ValueError: pass
+    return delay
+
+def fetch_crawl_delay(scheme, host, session, cache=None):
+    # 其他域名 (子域名/列表模式) 首次出现时只读取 robots.txt 中的 Crawl-delay
+    r = cached_get(session, f"{scheme}://{host}/robots.txt", cache, timeout=10, allow_redirects=True, verify=False)
+    try: return parse_crawl_delay(r.text.lower()) if r.status_code == 200 else None
+    finally: r.close()
+
+def parse_retry_after(value):
+    if not value: return None
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError): return None
+
+class HostThrottle:
+    # 每个域名一个令牌桶: Crawl-delay 按域名封顶, 429/503 减半并遵循 Retry-After, 低延迟时逐步提速
+    # crawl_delays 为已知的 {域名: Crawl-delay}; 其他域名首次出现时经 robots_delay(scheme, 域名) 查询一次
+    def __init__(self, rate=DEFAULT_HOST_RATE, crawl_delays=None, robots_delay=None, burst=2.0):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._delays = {}
+        self._loading = {}
+        self._robots_delay = robots_delay
+        self.burst = burst
+        self.rate = rate
+        for host, crawl_delay in (crawl_delays or {}).items():
+            self.set_crawl_delay(host, crawl_delay)
+
+    def set_crawl_delay(self, host, crawl_delay):
+        host = host.lower()
+        with self._lock:
+            self._delays[host] = crawl_delay
+            b = self._buckets.get(host)
+            if b and crawl_delay and crawl_delay > 0:
+                b["max_rate"] = min(b["max_rate"], 1.0 / crawl_delay)
+                b["burst"] = 1.0
+                b["rate"] = self._clamp(b["rate"], b)
+
+    def _resolve_delay(self, url):
+        # 同一域名只查询一次 robots.txt; 并发的其他线程等待首个线程的结果
+        parts = urlparse(url)
+        host = parts.netloc.lower()
+        with self._lock:
+            if host in self._delays: return
+            loading = self._loading.get(host)
+            if loading is None:
+                self._loading[host] = threading.Event()
+        if loading is not None:
+            loading.wait()
+            return
+        crawl_delay = None
+        try:
+            if self._robots_delay: crawl_delay = self._robots_delay(parts.scheme, host)
+        except Exception:
+            pass
+        finally:
+            self.set_crawl_delay(host, crawl_delay)
+            with self._lock: loading = self._loading.pop(host)
+            loading.set()
+
+    @staticmethod
+    def _clamp(rate, b):
+        return max(min(MIN_HOST_RATE, b["max_rate"]), min(rate, b["max_rate"]))
+
+    def _bucket(self, host):
+        if host not in self._buckets:
+            crawl_delay = self._delays.get(host)
+            polite = bool(crawl_delay and crawl_delay > 0)
+            b = {
+                "max_rate": min(MAX_HOST_RATE, 1.0 / crawl_delay) if polite else MAX_HOST_RATE,
+                "burst": 1.0 if polite else self.burst, "tokens": 1.0, "updated": time.monotonic(),
+                "blocked_until": 0.0, "requests": 0, "throttled": 0
+            }
+            b["rate"] = self._clamp(self.rate, b)
+            self._buckets[host] = b
+        return self._buckets[host]
+
+    def acquire(self, url):
+        self._resolve_delay(url)
+        host = urlparse(url).netloc.lower()
+        while True:
+            with self._lock:
+                b = self._bucket(host)
+                now = time.monotonic()
+                b["tokens"] = min(b["burst"], b["tokens"] + (now - b["updated"]) * b["rate"])
+                b["updated"] = now
+                wait_for = b["blocked_until"] - now
+                if wait_for <= 0:
+                    if b["tokens"] >= 1:
+                        b["tokens"] -= 1
+                        b["requests"] += 1
+                        return
+                    wait_for = (1 - b["tokens"]) / b["rate"]
+            time.sleep(wait_for)
+
+    def report(self, url, status, latency, retry_after=None):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            b = self._bucket(host)
+            if status in THROTTLE_STATUSES:
+                b["rate"] = self._clamp(b["rate"] / 2, b)
+                b["throttled"] += 1
+                pause = parse_retry_after(retry_after)
+                if pause is None: pause = 1.0 / b["rate"]
+                b["blocked_until"] = max(b["blocked_until"], time.monotonic() + min(pause, MAX_RETRY_AFTER))
+            elif status is None or latency > SLOW_LATENCY:
+                b["rate"] = self._clamp(b["rate"] * 0.75, b)
+            elif latency < FAST_LATENCY:
+                b["rate"] = self._clamp(b["rate"] * 1.1, b)
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: {"rate": round(b["rate"], 2), "requests": b["requests"], "throttled": b["throttled"]}
+                for host, b in self._buckets.items()
+            }
+
+# --- Level 5: 抓取队列、断点续爬与链接图 (Frontier, Checkpoint & Link Graph) ---
+SEED_PRIORITY = -100.0
+CHECKPOINT_DIR = STATE_DIR
+CHECKPOINT_EVERY = 25
+RESULTS_DIR = os.path.join(STATE_DIR, "results")
+RESULTS_KEEP = 20
+MATRIX_PAGE_ROWS = 500
+
+def parse_sitemap_date(value):
+    try: return date.fromisoformat((value or "").strip()[:10])
+    except ValueError: return None
+
+# Sitemap 流式解析: 递归索引、自动解压 gzip、iterparse 逐条产出, 内存占用与文件大小无关
+MAX_SITEMAP_FILES = 1000
+SITEMAP_TIMEOUT = 15
+SITEMAP_POLL = 0.2
+GZIP_MAGIC = b"\x1f\x8b"
+
+def iter_sitemap_records(stream):
+    # 产出 (kind, loc, lastmod, priority, alternates), kind 为 "url" 或索引中的子 "sitemap"
+    root = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = elem
+            continue
+        if event != "end": continue
+        kind = elem.tag.rsplit('}', 1)[-1]
+        if kind not in ("url", "sitemap"): continue
+        fields, alternates = {}, []
+        for child in elem:
+            name = child.tag.rsplit('}', 1)[-1]
+            if name == 'link':
+                if child.get('hreflang') and child.get('href'): alternates.append([child.get('hreflang'), child.get('href')])
+            else:
+                fields[name] = (child.text or "").strip()
+        root.clear()
+        if not fields.get('loc'): continue
+        try: priority = float(fields['priority']) if fields.get('priority') else None
+        except ValueError: priority = None
+        yield kind, fields['loc'], parse_sitemap_date(fields.get('lastmod')), priority, alternates
+
+def open_sitemap(session, url):
+    response = session.get(url, stream=True, timeout=SITEMAP_TIMEOUT, verify=False)
+    if response.status_code != 200:
+        response.close()
+        return response, None
+    stream = ChunkStream(response.iter_content(STREAM_CHUNK))
+    if stream.peek(2) == GZIP_MAGIC: stream = gzip.GzipFile(fileobj=stream)
+    return response, stream
+
+def stream_sitemaps(session, urls, on_record, max_files=MAX_SITEMAP_FILES):
+    # 广度优先展开 Sitemap 索引, 每条 <url> 立即回调; 返回各文件的解析结果汇总
+    result = {"valid": [], "invalid": [], "failed": [], "has_hreflang": False}
+    pending, visited = deque(urls), set()
+    while pending and len(visited) < max_files:
+        sm_url = pending.popleft().strip()
+        if not sm_url or sm_url in visited: continue
+        visited.add(sm_url)
+        try:
+            response, stream = open_sitemap(session, sm_url)
+        except Exception:
+            result["failed"].append(sm_url)
+            continue
+        if stream is None:
+            result["failed"].append(sm_url)
+            continue
+        try:
+            for kind, loc, lastmod, priority, alternates in iter_sitemap_records(stream):
+                if kind == "sitemap":
+                    pending.append(urljoin(sm_url, loc))
+                    continue
+                if alternates: result["has_hreflang"] = True
+                on_record(loc, lastmod, priority, alternates)
+            result["valid"].append(sm_url)
+        except (ET.ParseError, OSError, EOFError):
+            result["invalid"].append(sm_url)
+        finally:
+            response.close()
+    return result
+
+# 列表模式: 上传的 URL 文件 (txt/CSV/Sitemap XML, 可 gzip) 逐块读取, 队列中只保留一小批待抓取地址
+LIST_CHUNK = 1000
+
+def iter_text_lines(stream):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    tail = ""
+    for chunk in iter(lambda: stream.read(STREAM_CHUNK), b""):
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        yield from lines
+    tail += decoder.decode(b"", final=True)
+    if tail: yield tail
+
+def iter_url_list(fileobj):
+    stream = ChunkStream(iter(lambda: fileobj.read(STREAM_CHUNK), b""))
+    if stream.peek(2) == GZIP_MAGIC:
+        unzipped = gzip.GzipFile(fileobj=stream)
+        stream = ChunkStream(iter(lambda: unzipped.read(STREAM_CHUNK), b""))
+    if stream.peek(512).lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        # Sitemap 只取 <url> 记录, 索引中的子 Sitemap 不在列表范围内
+        for kind, loc, _, _, _ in iter_sitemap_records(stream):
+            if kind == "url": yield loc
+        return
+    # 文本/CSV: 每行取第一个以 http(s):// 开头的单元格, 表头等其他行自动忽略
+    for row in csv.reader(iter_text_lines(stream)):
+        url = next((c.strip() for c in row if c.strip().lower().startswith(("http://", "https://"))), None)
+        if url: yield url
+
+class CrawlFrontier:
+    # 小顶堆: 分数 = 链接深度 - Sitemap 权重, 同分按发现顺序 (即 BFS)
+    def __init__(self, sitemap_hints=None, journal=None):
+        self._heap = []
+        self._seq = 0
+        self.sitemap_hints = sitemap_hints or {}
+        self.journal = journal
+
+    def score(self, url, depth):
+        score = float(depth)
+        hint = self.sitemap_hints.get(url)
+        if hint:
+            priority, lastmod = hint
+            score -= 2 * (priority if priority is not None else 0.5)
+            if lastmod:
+                age_days = (date.today() - lastmod).days
+                score -= max(0.0, 1 - age_days / 365)
+        return score
+
+    def push(self, url, depth=0, priority=None):
+        if priority is None: priority = self.score(url, depth)
+        heapq.heappush(self._heap, (priority, self._seq, url, depth))
+        if self.journal: self.journal.record_push(url, depth, priority, self._seq)
+        self._seq += 1
+
+    def pop(self):
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+    def done(self, url):
+        if self.journal: self.journal.record_done(url)
+
+    def restore(self, rows):
+        self._heap = [(priority, seq, url, depth) for url, depth, priority, seq in rows]
+        heapq.heapify(self._heap)
+        self._seq = max((entry[1] for entry in self._heap), default=-1) + 1
+
+    def __len__(self):
+        return len(self._heap)
+
+# URL 规范化: 仅用于去重, 实际抓取仍使用首次发现的原始链接, 避免人为制造跳转
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {"gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl", "igshid", "spm"}
+SESSION_PARAMS = {"sid", "sessionid", "session_id", "phpsessid", "jsessionid", "aspsessionid", "cfid", "cftoken"}
+DEFAULT_URL_POLICY = {"strip_tracking": True, "sort_query": True, "ignore_trailing_slash": True, "ignore_case": False}
+
+# 爬虫陷阱: 日历、分面筛选等 URL 模式各自限额
+TRAP_PATTERN_LIMIT = 50
+MAX_SEGMENT_REPEATS = 2
+MAX_PATH_DEPTH = 12
+CALENDAR_PARAMS = {"date", "day", "month", "year", "week", "cal", "calendar"}
+CALENDAR_PATH = re.compile(r'/(19|20)\d{2}[/-](0?[1-9]|1[0-2])(\b|/)')
+
+def canonicalize_url(url, policy=None):
+    policy = {**DEFAULT_URL_POLICY, **(policy or {})}
+    try:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = re.sub(r';jsessionid=[^/]*', '', parts.path, flags=re.IGNORECASE) or "/"
+    if policy["ignore_case"]: path = path.lower()
+    if policy["ignore_trailing_slash"] and len(path) > 1: path = path.rstrip('/') or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SESSION_PARAMS]
+    if policy["strip_tracking"]:
+        query = [(k, v) for k, v in query if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS]
+    if policy["sort_query"]: query.sort()
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+class TrapGuard:
+    def __init__(self, limit=TRAP_PATTERN_LIMIT, journal=None):
+        self.limit = limit
+        self.counts = {}
+        self.trapped = {}
+        self.journal = journal
+
+    def pattern(self, url):
+        parts = urlsplit(url)
+        segments = [s for s in parts.path.split('/') if s]
+        if len(segments) > MAX_PATH_DEPTH or any(segments.count(s) > MAX_SEGMENT_REPEATS for s in set(segments)):
+            return "loop:" + parts.netloc + "/" + "/".join(segments[:3])
+        keys = sorted({k.lower() for k, _ in parse_qsl(parts.query, keep_blank_values=True)})
+        shape = parts.netloc + re.sub(r'\d+', '#', parts.path)
+        if CALENDAR_PATH.search(parts.path) or CALENDAR_PARAMS.intersection(keys):
+            return "calendar:" + shape + ("?" + "&".join(keys) if keys else "")
+        if len(keys) >= 2:
+            return "facet:" + shape + "?" + "&".join(keys)
+        return None
+
+    def allow(self, url):
+        pattern = self.pattern(url)
+        if not pattern: return True
+        if pattern.startswith("loop:"):
+            n = self.limit + 1
+        else:
+            n = self.counts.get(pattern, 0) + 1
+            self.counts[pattern] = n
+        if n > self.limit:
+            example, skipped = self.trapped.get(pattern, (url, 0))
+            self.trapped[pattern] = (example, skipped + 1)
+        if self.journal: self.journal.record_trap(pattern, self.counts.get(pattern, 0), *self.trapped.get(pattern, (None, 0)))
+        return n <= self.limit
+
+    def restore(self, rows):
+        # 断点续爬: 恢复各模式的计数与已拦截的示例/次数, 已到上限的模式不会被重新放行
+        for pattern, count, example, skipped in rows:
+            if count: self.counts[pattern] = count
+            if skipped: self.trapped[pattern] = (example, skipped)
+
+    def issues(self):
+        return [
+            {"id": "crawl_trap", "category": "access", "severity": "Medium", "url": example, "args": [pattern.split(":", 1)[1], skipped]}
+            for pattern, (example, skipped) in self.trapped.items()
+        ]
+
+def audit_key(*parts):
+    return hashlib.md5(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+class CrawlCheckpoint:
+    # SQLite 断点: 队列/已见集合/页面/问题按批增量落盘, 中断后可从断点继续
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS frontier (url TEXT PRIMARY KEY, depth INTEGER, priority REAL, seq INTEGER);
+            CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS sitemap (url TEXT PRIMARY KEY, priority REAL, lastmod TEXT, alternates TEXT);
+            CREATE TABLE IF NOT EXISTS traps (pattern TEXT PRIMARY KEY, count INTEGER, example TEXT, skipped INTEGER);
+            CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT);
+            CREATE TABLE IF NOT EXISTS issues (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT);
+            CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, url TEXT);
+            CREATE TABLE IF NOT EXISTS edges (src INTEGER, dst INTEGER);
+        """)
+        self._frontier_ops, self._trap_ops = {}, {}
+        self._new_seen, self._new_sitemap = [], []
+        self._saved_issues = 0
+        self._saved_nodes = 0
+        self._saved_edges = 0
+
+    @classmethod
+    def open(cls, key):
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        return cls(os.path.join(CHECKPOINT_DIR, f"crawl_{key}.sqlite"))
+
+    def record_push(self, url, depth, priority, seq):
+        self._frontier_ops[url] = (url, depth, priority, seq)
+        self._new_seen.append((url,))
+
+    def record_done(self, url):
+        self._frontier_ops[url] = None
+
+    def record_seen(self, url):
+        # 未入队但已处理过的 URL (跳转目标、被陷阱规则拦截的链接)
+        self._new_seen.append((url,))
+
+    def record_trap(self, pattern, count, example, skipped):
+        self._trap_ops[pattern] = (pattern, count, example, skipped)
+
+    def record_sitemap(self, loc, priority, lastmod, alternates):
+        self._new_sitemap.append((loc, priority, lastmod.isoformat() if lastmod else None, json.dumps(alternates) if alternates else None))
+
+    def load(self):
+        meta = {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM meta")}
+        if meta.get("status") != "running":
+            self.reset()
+            return None
+        state = {
+            "meta": meta,
+            "frontier": self.conn.execute("SELECT url, depth, priority, seq FROM frontier").fetchall(),
+            "seen": [r[0] for r in self.conn.execute("SELECT url FROM seen")],
+            "sitemap": self.conn.execute("SELECT url, priority, lastmod, alternates FROM sitemap").fetchall(),
+            "traps": self.conn.execute("SELECT pattern, count, example, skipped FROM traps").fetchall(),
+            "page_count": self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0],
+            "issues": [json.loads(r[0]) for r in self.conn.execute("SELECT data FROM issues ORDER BY id")],
+            "nodes": [r[0] for r in self.conn.execute("SELECT url FROM nodes ORDER BY id")],
+            "edges": self.conn.execute("SELECT src, dst FROM edges ORDER BY rowid").fetchall(),
+        }
+        self._saved_issues = len(state["issues"])
+        self._saved_nodes = len(state["nodes"])
+        self._saved_edges = len(state["edges"])
+        return state
+
+    def reset(self):
+        with self.conn:
+            for table in ("meta", "frontier", "seen", "sitemap", "traps", "pages", "issues", "nodes", "edges"):
+                self.conn.execute(f"DELETE FROM {table}")
+        self._frontier_ops, self._trap_ops, self._new_seen, self._new_sitemap = {}, {}, [], []
+        self._saved_issues = self._saved_nodes = self._saved_edges = 0
+
+    def iter_pages(self):
+        # 断点中的页面逐行读出, 续爬时直接转写到新的结果库, 不整体载入内存
+        for (data,) in self.conn.execute("SELECT data FROM pages ORDER BY id"):
+            yield json.loads(data)
+
+    def save(self, pages, issues, meta, status="running", graph=None):
+        # pages 只含上次保存之后新增的页面; 问题与链接图按已保存的行数增量写入
+        meta = dict(meta, status=status)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO frontier VALUES (?, ?, ?, ?)", [row for row in self._frontier_ops.values() if row])
+            self.conn.executemany("DELETE FROM frontier WHERE url = ?", [(u,) for u, row in self._frontier_ops.items() if row is None])
+            self.conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", self._new_seen)
+            self.conn.executemany("INSERT OR REPLACE INTO sitemap VALUES (?, ?, ?, ?)", self._new_sitemap)
+            self.conn.executemany("INSERT OR REPLACE INTO traps VALUES (?, ?, ?, ?)", self._trap_ops.values())
+            self.conn.executemany("INSERT INTO pages (data) VALUES (?)", [(json.dumps(p, default=str),) for p in pages])
+            self.conn.executemany("INSERT INTO issues (data) VALUES (?)", [(data,) for data in issues.dumps(self._saved_issues)])
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [(k, json.dumps(v, default=str)) for k, v in meta.items()])
+            if graph:
+                self.conn.executemany("INSERT INTO nodes VALUES (?, ?)", enumerate(graph.urls[self._saved_nodes:], self._saved_nodes))
+                self.conn.executemany("INSERT INTO edges VALUES (?, ?)", zip(graph.src[self._saved_edges:], graph.dst[self._saved_edges:]))
+                self._saved_nodes, self._saved_edges = len(graph.urls), len(graph.src)
+        self._frontier_ops, self._trap_ops, self._new_seen, self._new_sitemap = {}, {}, [], []
+        self._saved_issues = len(issues)
+
+    def close(self):
+        self.conn.close()
+
+AGG_EXAMPLES = 5
+AGG_GROUP_URLS = 20
+
+class IssueAggregator:
+    # 问题汇总随问题产生增量更新: 每种问题的计数、严重度/分类分布、首条参数与证据、前几个示例 URL;
+    # 重复类问题按 meta (首个 URL) 分组, 保留前几组且每组 URL 数封顶. 所有视图读取的开销只与问题种类数有关
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    def add(self, issue):
+        iid = issue['id']
+        e = self.entries.get(iid)
+        if e is None:
+            e = self.entries[iid] = {
+                "id": iid, "category": issue['category'], "severity": issue['severity'],
+                "count": 0, "examples": [], "args": issue.get('args', []),
+                "example_evidence": issue.get("evidence", ""), "groups": {}, "by_severity": {}, "by_category": {}
+            }
+        e["count"] += 1
+        e["by_severity"][issue['severity']] = e["by_severity"].get(issue['severity'], 0) + 1
+        e["by_category"][issue['category']] = e["by_category"].get(issue['category'], 0) + 1
+        if iid in DUPLICATE_GROUP_IDS and "meta" in issue:
+            group = e["groups"].get(issue['meta'])
+            if group is None and len(e["groups"]) < AGG_EXAMPLES: group = e["groups"][issue['meta']] = [issue['meta']]
+            if group is not None and len(group) < AGG_GROUP_URLS: group.append(issue['url'])
+        elif len(e["examples"]) < AGG_EXAMPLES:
+            e["examples"].append(issue.get('url'))
+
+    def remove(self, iid):
+        self.entries.pop(iid, None)
+
+    @property
+    def total(self):
+        return sum(e["count"] for e in self.entries.values())
+
+    def counts(self):
+        return {iid: e["count"] for iid, e in self.entries.items()}
+
+    def totals(self, field):
+        # field: "severity" 或 "category"
+        out = {}
+        for e in self.entries.values():
+            for k, n in e["by_" + field].items(): out[k] = out.get(k, 0) + n
+        return out
+
+    def slides(self):
+        # 每种问题一张幻灯片; 重复类问题的示例为 "Duplicate Group" 分组
+        out = []
+        for e in self.entries.values():
+            s = {k: e[k] for k in ("id", "category", "severity", "count", "examples", "args", "example_evidence")}
+            if e["groups"]:
+                s["examples"] = ["Duplicate Group:\n" + "\n".join(f"- {u}" for u in g) for g in e["groups"].values()]
+            out.append(s)
+        return out
+
+class IssueTable:
+    # 紧凑问题表: issue id / 分类 / 严重度编码为小整数, URL 驻留为编号, 按列存入并行数组;
+    # args/evidence/meta 等附加字段只有部分问题携带, 按行号稀疏保存为紧凑 JSON 字符串 (比 dict + list 小数倍).
+    # 对外仍可像列表一样追加、遍历与切片
+    CORE = ("id", "category", "severity", "url")
+
+    def __init__(self, issues=()):
+        self.values = {"id": [], "category": [], "severity": []}
+        self.codes = {field: {} for field in self.values}
+        self.columns = {"id": array('H'), "category": array('B'), "severity": array('B'), "url": array('i')}
+        self.urls = []
+        self.url_ids = {}
+        self.extra = {}
+        self.summary = IssueAggregator()
+        self.extend(issues)
+
+    def _code(self, field, value):
+        codes = self.codes[field]
+        c = codes.get(value)
+        if c is None:
+            c = codes[value] = len(codes)
+            self.values[field].append(value)
+        return c
+
+    def _url_id(self, url):
+        if url is None: return -1
+        uid = self.url_ids.get(url)
+        if uid is None:
+            uid = self.url_ids[url] = len(self.urls)
+            self.urls.append(url)
+        return uid
+
+    def append(self, issue):
+        cols = self.columns
+        for field in ("id", "category", "severity"): cols[field].append(self._code(field, issue[field]))
+        cols["url"].append(self._url_id(issue.get("url")))
+        extra = {k: v for k, v in issue.items() if k not in self.CORE}
+        if extra: self.extra[len(cols["url"]) - 1] = json.dumps(extra, separators=(',', ':'), ensure_ascii=False, default=str)
+        self.summary.add(issue)
+
+    def extend(self, issues):
+        for issue in issues: self.append(issue)
+
+    def __len__(self):
+        return len(self.columns["url"])
+
+    def row(self, n):
+        cols = self.columns
+        issue = {field: self.values[field][cols[field][n]] for field in ("id", "category", "severity")}
+        if cols["url"][n] >= 0: issue["url"] = self.urls[cols["url"][n]]
+        if n in self.extra: issue.update(json.loads(self.extra[n]))
+        return issue
+
+    def __getitem__(self, key):
+        if isinstance(key, slice): return [self.row(n) for n in range(*key.indices(len(self)))]
+        return self.row(key if key >= 0 else len(self) + key)
+
+    def __iter__(self):
+        for n in range(len(self)): yield self.row(n)
+
+    def column(self, field):
+        return np.frombuffer(self.columns[field], dtype=np.int32 if field == "url" else self.columns[field].typecode)
+
+    def drop(self, *iids):
+        # 原地删除指定 issue id 的所有行
+        codes = [self.codes["id"][i] for i in iids if i in self.codes["id"]]
+        if not codes: return
+        for iid in iids: self.summary.remove(iid)
+        keep = np.flatnonzero(~np.isin(self.column("id"), codes))
+        for field, col in self.columns.items():
+            self.columns[field] = array(col.typecode, self.column(field)[keep].tobytes())
+        self.extra = {new: self.extra[old] for new, old in enumerate(keep.tolist()) if old in self.extra}
+
+    def select(self, *iids):
+        # 只还原指定 issue id 的行: 按 id 列筛出行号, 其余行不解码
+        codes = [self.codes["id"][i] for i in iids if i in self.codes["id"]]
+        if not codes: return
+        for n in np.flatnonzero(np.isin(self.column("id"), codes)).tolist(): yield self.row(n)
+
+    def frame(self):
+        # 分类列 DataFrame: 编码数组直接作为 Categorical 编码, 不复制字符串; 附加字段不展开
+        data = {field: pd.Categorical.from_codes(self.column(field).astype(np.int32), categories=self.values[field]) for field in ("id", "category", "severity")}
+        data["url"] = pd.Categorical.from_codes(self.column("url"), categories=pd.Index(self.urls, dtype=object))
+        return pd.DataFrame(data)
+
+    def dumps(self, start=0):
+        # 从 start 行起逐行序列化为 JSON: 核心字段按列拼出, 附加字段直接接上已存的 JSON 片段, 无需先还原为 dict
+        cols, values = self.columns, self.values
+        for n in range(start, len(self)):
+            core = {field: values[field][cols[field][n]] for field in ("id", "category", "severity")}
+            if cols["url"][n] >= 0: core["url"] = self.urls[cols["url"][n]]
+            text = json.dumps(core, ensure_ascii=False, default=str)
+            yield text[:-1] + "," + self.extra[n][1:] if n in self.extra else text
+
+class ResultsStore:
+    # 审计结果库: 页面在抓取过程中按批追加到 SQLite 后即从内存释放, 抓取结束后的全站检查与界面都从库中逐行读取;
+    # 问题只保存汇总 (界面与 PPT 只读汇总). 浏览器会话中只保存文件路径, 审计结束后文件不再变化, 界面以只读方式打开并缓存汇总
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self._page_count = None
+        self._summary = None
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (seq INTEGER PRIMARY KEY, url TEXT, status INTEGER, data TEXT);
+            CREATE TABLE IF NOT EXISTS summary (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._page_count = 0
+
+    @classmethod
+    def create(cls):
+        # 每次审计一个新文件, 只保留最近 RESULTS_KEEP 个
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        old = sorted((f for f in os.listdir(RESULTS_DIR) if f.endswith(".sqlite")), reverse=True)
+        for f in old[RESULTS_KEEP - 1:]:
+            for suffix in ("", "-wal", "-shm"):
+                try: os.remove(os.path.join(RESULTS_DIR, f + suffix))
+                except OSError: pass
+        name = f"results_{time.strftime('%Y%m%d%H%M%S')}_{os.urandom(4).hex()}.sqlite"
+        return cls(os.path.join(RESULTS_DIR, name))
+
+    @classmethod
+    def open(cls, path):
+        return cls(path, readonly=True) if path and os.path.exists(path) else None
+
+    def append(self, pages, issues):
+        # pages 为新增页面 (可以是生成器, 逐行写入)
+        with self.conn:
+            cur = self.conn.executemany("INSERT INTO pages (url, status, data) VALUES (?, ?, ?)", ((p.get("URL"), p.get("Status"), json.dumps(p, default=str)) for p in pages))
+            self._page_count += max(cur.rowcount, 0)
+            self._save_summary(issues)
+
+    def update_pages(self, update, batch=MATRIX_PAGE_ROWS):
+        # 抓取结束后按批回写链接指标等字段: update(page) 返回需要合并的字段, 无变化返回 None
+        last = 0
+        while True:
+            rows = self.conn.execute("SELECT seq, data FROM pages WHERE seq > ? ORDER BY seq LIMIT ?", (last, batch)).fetchall()
+            if not rows: return
+            changes = []
+            for seq, data in rows:
+                page = json.loads(data)
+                fields = update(page)
+                if fields: changes.append((json.dumps({**page, **fields}, default=str), seq))
+            with self.conn: self.conn.executemany("UPDATE pages SET data = ? WHERE seq = ?", changes)
+            last = rows[-1][0]
+
+    def finish(self, issues):
+        # 问题汇总在抓取结束后还会变化 (hreflang 取舍、聚类结果), 最后再写一次
+        with self.conn: self._save_summary(issues)
+
+    def _save_summary(self, issues):
+        # 页面数与问题汇总随结果一起落盘, 界面直接读取, 无需扫描页面表
+        self.conn.executemany("INSERT OR REPLACE INTO summary VALUES (?, ?)", [
+            ("pages", json.dumps(self._page_count)), ("issues", json.dumps(issues.summary.entries, default=str))
+        ])
+
+    def _summary_value(self, key):
+        row = self.conn.execute("SELECT value FROM summary WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def summary(self):
+        if self._summary is None: self._summary = IssueAggregator(self._summary_value("issues"))
+        return self._summary
+
+    def page_count(self):
+        if self._page_count is None: self._page_count = self._summary_value("pages") or 0
+        return self._page_count
+
+    def status_counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM pages GROUP BY status ORDER BY COUNT(*) DESC"))
+
+    def iter_pages(self, offset=0, limit=-1):
+        for (data,) in self.conn.execute("SELECT data FROM pages ORDER BY seq LIMIT ? OFFSET ?", (limit, offset)):
+            yield json.loads(data)
+
+    def pages_frame(self, offset=0, limit=-1):
+        return pd.DataFrame(list(self.iter_pages(offset, limit)))
+
+    def pages_csv(self):
+        # 列为所有页面字段的并集 (按首次出现顺序), 逐行写出
+        columns = {}
+        for page in self.iter_pages():
+            for k in page: columns.setdefault(k, None)
+        out = StringIO()
+        writer = csv.DictWriter(out, fieldnames=list(columns), extrasaction='ignore')
+        writer.writeheader()
+        for page in self.iter_pages(): writer.writerow(page)
+        return out.getvalue().encode('utf-8')
+
+    def close(self):
+        self.conn.close()
+
+@st.cache_resource(max_entries=RESULTS_KEEP)
+def _cached_results(path):
+    return ResultsStore.open(path)
+
+def open_results():
+    # 每个结果文件只打开一次, 各次重跑与各会话共用同一只读连接及其缓存的页面数与问题汇总
+    path = st.session_state.get('results_path')
+    if not path or not os.path.exists(path): return None
+    return _cached_results(path)
+
+class LinkGraph:
+    # 站内链接图: URL 驻留为 int32 节点编号, 边以两个 int32 数组追加存储, 计算时再转为 CSR
+    def __init__(self):
+        self.ids = {}
+        self.urls = []
+        self.src = array('i')
+        self.dst = array('i')
+
+    def node(self, url):
+        nid = self.ids.get(url)
+        if nid is None:
+            nid = self.ids[url] = len(self.urls)
+            self.urls.append(url)
+        return nid
+
+    def add_links(self, url, targets):
+        s = self.node(url)
+        for t in set(targets):
+            d = self.node(t)
+            if d != s:
+                self.src.append(s)
+                self.dst.append(d)
+
+    def restore(self, urls, edges):
+        for url in urls: self.node(url)
+        for s, d in edges:
+            self.src.append(s)
+            self.dst.append(d)
+
+    def arrays(self):
+        return np.frombuffer(self.src, dtype=np.int32), np.frombuffer(self.dst, dtype=np.int32)
+
+    def csr(self):
+        src, dst = self.arrays()
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(len(self.urls) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(self.urls)), out=indptr[1:])
+        return indptr, dst[order]
+
+    def inlinks(self):
+        return np.bincount(self.arrays()[1], minlength=len(self.urls))
+
+    def pagerank(self, damping=0.85, iterations=100, tol=1e-8):
+        n = len(self.urls)
+        if not n: return np.zeros(0)
+        src, dst = self.arrays()
+        out_deg = np.bincount(src, minlength=n).astype(np.float64)
+        dangling = out_deg == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(iterations):
+            share = np.divide(rank, out_deg, out=np.zeros(n), where=~dangling)
+            new = np.bincount(dst, weights=share[src], minlength=n)
+            new = (1 - damping) / n + damping * (new + rank[dangling].sum() / n)
+            if np.abs(new - rank).sum() < tol:
+                rank = new
+                break
+            rank = new
+        return rank
+
+    def click_depth(self, roots):
+        # 按层 BFS: 每层一次性展开所有节点的出边, -1 表示从起点不可达
+        indptr, indices = self.csr()
+        depth = np.full(len(self.urls), -1, dtype=np.int32)
+        level = np.unique(np.array([self.ids[r] for r in roots if r in self.ids], dtype=np.int64))
+        d = 0
+        while level.size:
+            depth[level] = d
+            starts, counts = indptr[level], indptr[level + 1] - indptr[level]
+            total = int(counts.sum())
+            if not total: break
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+            nxt = np.unique(indices[offsets])
+            level = nxt[depth[nxt] < 0]
+            d += 1
+        return depth
+
+    def orphans(self, urls):
+        # 只判断图中已有的节点; 未抓取到的 URL 没有出链信息, 不能算作孤立页面
+        inlinks = self.inlinks()
+        return [u for u in urls if u in self.ids and inlinks[self.ids[u]] == 0]
+
+def create_analysis_pool(workers):
+    # 抓取线程、后台检查与 DNS 预解析线程都在运行, 直接 fork 多线程进程可能让子进程死锁;
+    # 改由 forkserver (不支持时用 spawn) 启动分析进程, 子进程只需导入 page_analyzer
+    if workers <= 1: return None
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["page_analyzer"])
+    else:
+        ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+
+def fetch_page(url, session, host_limiter, throttle, cache=None, max_bytes=None):
+    throttle.acquire(url)
+    with host_limiter.slot(url):
+        started = time.monotonic()
+        try:
+            response = cached_get(session, url, cache, max_bytes, True, timeout=10, allow_redirects=True, verify=False)
+        except Exception:
+            throttle.report(url, None, time.monotonic() - started)
+            raise
+    throttle.report(url, response.status_code, time.monotonic() - started, response.headers.get('Retry-After'))
+    return response
+
 # --- Level 6: 核心逻辑 (Data Layer) ---
 def get_translated_text(issue_id, lang, args=None):
     if args is None: args = []
@@ -603,23 +1925,101 @@ def get_translated_text(issue_id, lang, args=None):
         "suggestion": safe_format(t.get(issue_id + "_sugg", ""), args)
     }
 
-def fetch_psi_data(url, api_key):
-    if not api_key: return None
-    endpoint = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url}&key={api_key}&strategy=mobile"
-    try:
-        response = requests.get(endpoint, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            crux = data.get('loadingExperience', {}).get('metrics', {})
-            if not crux: return {"error": "No CrUX data available"}
-            return {
-                "LCP": crux.get('LARGEST_CONTENTFUL_PAINT_MS', {}).get('percentile', 0) / 1000,
-                "CLS": crux.get('CUMULATIVE_LAYOUT_SHIFT_SCORE', {}).get('percentile', 0) / 100,
-                "INP": crux.get('INTERACTION_TO_NEXT_PAINT', {}).get('percentile', 0),
-                "FCP": crux.get('FIRST_CONTENTFUL_PAINT_MS', {}).get('percentile', 0) / 1000,
-            }
-        else: return {"error": f"API Error: {response.status_code}"}
-    except Exception as e: return {"error": str(e)}
+# PageSpeed Insights: 结果按 (URL, strategy) 持久缓存; 有限并发 + 配额令牌桶; 429/5xx 退避重试
+PSI_ENDPOINT = "https://www.googleapis.com/pagespeedonline/v5/runPagespeed"
+PSI_STRATEGIES = ("mobile", "desktop")
+PSI_CACHE_TTL = 7 * 86400 # CrUX 为 28 天滚动窗口的 p75, 每日更新但变化缓慢, 一周内复用即可
+PSI_CONCURRENCY = 4
+PSI_QUERIES_PER_MIN = 240 # PSI API 默认配额
+PSI_RETRIES = 3
+PSI_RETRY_STATUSES = (429, 500, 502, 503, 504)
+PSI_TEMPLATE_MIN_PAGES = 3 # 模板至少有这么多页面才抽样测速, 避免为零散页面消耗配额
+PSI_TEMPLATE_SAMPLES = 10
+
+def parse_psi_response(data):
+    crux = data.get('loadingExperience', {}).get('metrics', {})
+    if not crux: return {"error": "No CrUX data available"}
+    return {
+        "LCP": crux.get('LARGEST_CONTENTFUL_PAINT_MS', {}).get('percentile', 0) / 1000,
+        "CLS": crux.get('CUMULATIVE_LAYOUT_SHIFT_SCORE', {}).get('percentile', 0) / 100,
+        "INP": crux.get('INTERACTION_TO_NEXT_PAINT', {}).get('percentile', 0),
+        "FCP": crux.get('FIRST_CONTENTFUL_PAINT_MS', {}).get('percentile', 0) / 1000,
+    }
+
+class PSIClient:
+    def __init__(self, api_key, cache_path=None, ttl=PSI_CACHE_TTL, concurrency=PSI_CONCURRENCY, per_minute=PSI_QUERIES_PER_MIN):
+        self.api_key = api_key
+        self.ttl = ttl
+        self.session = create_http_session(pool_size=concurrency, retries=0)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.rate = per_minute / 60.0
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        if cache_path is None:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            cache_path = os.path.join(STATE_DIR, "psi_cache.sqlite")
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS psi (url TEXT, strategy TEXT, fetched_at REAL, data TEXT, PRIMARY KEY (url, strategy))")
+
+    def cached(self, url, strategy):
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM psi WHERE url = ? AND strategy = ? AND fetched_at > ?", (url, strategy, time.time() - self.ttl)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, url, strategy, data):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO psi VALUES (?, ?, ?, ?)", (url, strategy, time.time(), json.dumps(data)))
+
+    def _acquire(self):
+        # 配额令牌桶: 所有线程共用; 收到 429 后整体暂停到 Retry-After 之后
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait_for = self.blocked_until - now
+                if wait_for <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+    def fetch(self, url, strategy="mobile"):
+        if not self.api_key: return None
+        hit = self.cached(url, strategy)
+        if hit: return hit
+        params = {"url": url, "key": self.api_key, "strategy": strategy}
+        error = None
+        for attempt in range(PSI_RETRIES + 1):
+            self._acquire()
+            try:
+                with self._slots:
+                    response = self.session.get(PSI_ENDPOINT, params=params, timeout=30)
+            except Exception as e:
+                error = str(e)
+                time.sleep(min(2 ** attempt, MAX_RETRY_AFTER))
+                continue
+            if response.status_code == 200:
+                # 无 CrUX 数据也是有效结果, 一并缓存以免重复消耗配额
+                data = parse_psi_response(response.json())
+                self._store(url, strategy, data)
+                return data
+            error = f"API Error: {response.status_code}"
+            if response.status_code not in PSI_RETRY_STATUSES: break
+            pause = parse_retry_after(response.headers.get('Retry-After'))
+            pause = min(pause if pause is not None else 2 ** attempt, MAX_RETRY_AFTER)
+            if response.status_code == 429:
+                with self._lock: self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            else:
+                time.sleep(pause)
+        return {"error": error}
+
+    def close(self):
+        self.conn.close()
 
 def check_cwv_issues(cwv_data, url, label=""):
     issues = []
@@ -656,22 +2056,19 @@ def check_cwv_issues(cwv_data, url, label=""):
 
     return issues
 
-def check_site_level_assets(start_url, lang="zh", check_robots=True, crawl_sitemap_flag=True, manual_sitemaps=None, baidu_mode=False):
-    issues = []
-    sitemap_has_hreflang = False
-    
-    initial_netloc = urlparse(start_url).netloc
-    base_url = f"{urlparse(start_url).scheme}://{initial_netloc}"
-    headers = get_browser_headers()
-    
+def check_robots_txt(base_url, check_robots=True, crawl_sitemap_flag=True, baidu_mode=False, session=None, cache=None):
+    # 返回 (问题列表, Crawl-delay, robots 中声明的 Sitemap); 抓取限速依赖此结果, 需在抓取前完成
+    issues, crawl_delay, sitemaps = [], None, []
+    session = session or create_http_session()
     robots_url = urljoin(base_url, "/robots.txt")
     if check_robots:
         try:
-            r = requests.get(robots_url, headers=headers, timeout=10, allow_redirects=True, stream=True, verify=False)
+            r = cached_get(session, robots_url, cache, timeout=10, allow_redirects=True, verify=False)
             if r.status_code != 200:
                 issues.append({"id": "no_robots", "category": "access", "severity": "Medium", "url": robots_url, "examples": [robots_url]})
             else:
                 content = r.text.lower()
+                crawl_delay = parse_crawl_delay(content)
                 if len(content.strip()) < 5:
                      issues.append({"id": "robots_quality_issue", "category": "access", "severity": "Medium", "url": robots_url, "args": ["File is empty or too short"], "examples": [robots_url]})
                 if "user-agent" not in content:
@@ -690,356 +2087,593 @@ def check_site_level_assets(start_url, lang="zh", check_robots=True, crawl_sitem
                     issues.append({"id": "robots_no_sitemap", "category": "access", "severity": "Low", "url": robots_url, "examples": [robots_url]})
                 
                 if crawl_sitemap_flag:
-                    sitemaps_in_robots = re.findall(r'sitemap:\s*(https?://\S+)', content, re.IGNORECASE)
-                    if sitemaps_in_robots:
-                        if manual_sitemaps is None: manual_sitemaps = []
-                        manual_sitemaps.extend(sitemaps_in_robots)
+                    sitemaps = re.findall(r'sitemap:\s*(https?://\S+)', content, re.IGNORECASE)
             r.close()
         except: 
             issues.append({"id": "no_robots", "category": "access", "severity": "Medium", "url": robots_url, "examples": [robots_url]})
 
+    return issues, crawl_delay, sitemaps
+
+def check_site_level_assets(start_url, lang="zh", check_robots=True, crawl_sitemap_flag=True, manual_sitemaps=None, baidu_mode=False, session=None, cache=None, on_sitemap_url=None, robots=None):
+    issues = []
+    sitemap_has_hreflang = False
+    site_meta = {"crawl_delay": None}
+    
+    initial_netloc = urlparse(start_url).netloc
+    base_url = f"{urlparse(start_url).scheme}://{initial_netloc}"
+    session = session or create_http_session()
+    
+    robots_issues, site_meta["crawl_delay"], robots_sitemaps = robots or check_robots_txt(base_url, check_robots, crawl_sitemap_flag, baidu_mode, session, cache)
+    issues.extend(robots_issues)
+    if robots_sitemaps: manual_sitemaps = list(manual_sitemaps or []) + robots_sitemaps
+
     sitemap_urls = manual_sitemaps if manual_sitemaps else [urljoin(base_url, "/sitemap.xml")]
-    any_valid = False
-    for sm_url in sitemap_urls:
-        if not sm_url.strip(): continue
-        try:
-            r = requests.get(sm_url, headers=headers, timeout=15, verify=False)
-            if r.status_code == 200:
-                try:
-                    ET.fromstring(r.content)
-                    any_valid = True
-                    if 'hreflang' in r.text or 'xhtml' in r.text: sitemap_has_hreflang = True
-                except:
-                    if not sm_url.endswith('.gz'):
-                        issues.append({"id": "sitemap_invalid", "category": "access", "severity": "Medium", "url": sm_url, "examples": [sm_url]})
-            else:
-                if manual_sitemaps: issues.append({"id": "no_sitemap", "category": "access", "severity": "Low", "url": sm_url, "examples": [sm_url]})
-        except:
-            if manual_sitemaps: issues.append({"id": "no_sitemap", "category": "access", "severity": "Low", "url": sm_url, "examples": [sm_url]})
 
-    if not any_valid and not manual_sitemaps:
+    sm_result = stream_sitemaps(session, sitemap_urls, on_sitemap_url or (lambda *record: None))
+    sitemap_has_hreflang = sm_result["has_hreflang"]
+    for sm_url in sm_result["invalid"]:
+        issues.append({"id": "sitemap_invalid", "category": "access", "severity": "Medium", "url": sm_url, "examples": [sm_url]})
+    if manual_sitemaps:
+        for sm_url in sm_result["failed"]:
+            issues.append({"id": "no_sitemap", "category": "access", "severity": "Low", "url": sm_url, "examples": [sm_url]})
+
+    if not sm_result["valid"] and not manual_sitemaps:
          issues.append({"id": "no_sitemap", "category": "access", "severity": "Low", "url": sitemap_urls[0], "examples": [sitemap_urls[0]]})
 
     try:
-        r = requests.get(urljoin(base_url, "/favicon.ico"), headers=headers, timeout=5, verify=False)
+        r = cached_get(session, urljoin(base_url, "/favicon.ico"), cache, timeout=5, verify=False)
         if r.status_code != 200 or int(r.headers.get('content-length', 0)) == 0:
             issues.append({"id": "no_favicon", "category": "image_ux", "severity": "Low", "url": base_url, "examples": [base_url]})
     except: pass
     
     if baidu_mode:
-        cc, country_name = check_server_location(start_url)
+        cc, country_name = check_server_location(start_url, session)
         if cc and cc != 'CN':
              issues.append({"id": "server_not_in_china", "category": "technical", "severity": "High", "url": start_url, "args": [country_name], "examples": [start_url]})
+        elif not cc:
+             issues.append({"id": "server_location_unknown", "category": "technical", "severity": "Low", "url": start_url, "examples": [start_url]})
+
+    return issues, sitemap_has_hreflang, site_meta
+
+def apply_link_metrics(graph, results, url_key, start_url, sitemap_urls, check_orphans=True):
+    # 链接图指标逐批写回结果库中的数据矩阵: 入链数、点击深度与内部 PageRank (以站内最高值为 100)
+    rank = graph.pagerank()
+    top = rank.max() if rank.size else 0
+    inlinks = graph.inlinks()
+    depth = graph.click_depth([url_key(start_url)])
+    crawled = set()
+    def metrics(page):
+        key = url_key(page["URL"])
+        if check_orphans: crawled.add(key)
+        nid = graph.ids.get(key)
+        if nid is None: return None
+        return {
+            "Inlinks": int(inlinks[nid]),
+            "Click_Depth": int(depth[nid]) if depth[nid] >= 0 else None,
+            "PageRank": round(float(rank[nid] / top * 100), 2) if top else 0.0,
+        }
+    results.update_pages(metrics)
+
+    # 孤立页面只在整站抓完 (队列耗尽) 时判断, 且只考虑实际抓取过的 Sitemap URL
+    if not check_orphans: return []
+    start_key = url_key(start_url)
+    orphans = [u for u in graph.orphans({url_key(u) for u in sitemap_urls} & crawled) if u != start_key]
+    return [{"id": "orphan_page", "category": "access", "severity": "Medium", "url": u, "args": [len(orphans)]} for u in orphans]
+
+def check_cross_page_signals(pages, issues, url_key, sitemap_hreflang=None):
+    # 全站交叉检查 (抓取结束后执行, 对页面只遍历一次, pages 可以是结果库的逐行迭代): hreflang 回链与 canonical 指向
+    keys, base_key = {}, url_key
+    def url_key(u):
+        # 同一 URL 会在页面、问题与 hreflang 中反复出现, 规范化结果缓存复用
+        k = keys.get(u)
+        if k is None: k = keys[u] = base_key(u)
+        return k
+    status = {}
+    for i in issues.select("http_3xx", "http_4xx", "http_5xx"):
+        if i['id'] == "http_3xx": status[url_key(i['url'])] = 301
+        elif i['id'] in ("http_4xx", "http_5xx") and i.get('args'): status[url_key(i['url'])] = int(i['args'][0])
+    # hreflang: 页面与 Sitemap 声明合并为 {页面: 备选版本集合}, 已知声明的备选页必须回链;
+    # canonical: {页面: canonical 目标}
+    raw, alternates, canonical = {}, {}, {}
+    for p in pages:
+        key = url_key(p['URL'])
+        status[key] = p['Status']
+        raw.setdefault(key, p['URL'])
+        if p['Status'] != 200: continue
+        # 已抓取但未声明 hreflang 的页面视为空备选集 (回链缺失最常见的情形); 只有未抓取的目标无法判断
+        alternates.setdefault(key, set()).update(url_key(href) for _, href in p.get('Hreflang') or ())
+        if p.get('Canonical'): canonical[key] = url_key(urljoin(p['URL'], p['Canonical']))
+    for loc, links in (sitemap_hreflang or {}).items():
+        alternates.setdefault(url_key(loc), set()).update(url_key(urljoin(loc, href)) for _, href in links)
+        raw.setdefault(url_key(loc), loc)
+
+    found = []
+    for key, targets in alternates.items():
+        missing = sorted(t for t in targets if t != key and t in alternates and key not in alternates[t])
+        if missing:
+            found.append({"id": "hreflang_no_return", "category": "indexability", "severity": "High", "url": raw[key], "args": [", ".join(missing[:3])]})
+
+    # canonical: 以 {页面: canonical 目标} 为指针森林, 带路径压缩地解析最终目标; 指向非终点即为链式 canonical
+    resolved = {}
+    def resolve(key):
+        path = []
+        while key in canonical and canonical[key] != key and key not in resolved:
+            if key in path: break # canonical 循环
+            path.append(key)
+            key = canonical[key]
+        end = resolved.get(key, key)
+        for k in path: resolved[k] = end
+        return end
+
+    for key, target in canonical.items():
+        if target == key: continue
+        code = status.get(target)
+        if code and 300 <= code < 400:
+            found.append({"id": "canonical_redirect", "category": "indexability", "severity": "High", "url": raw[key], "args": [target]})
+        elif code and code >= 400:
+            found.append({"id": "canonical_broken", "category": "indexability", "severity": "High", "url": raw[key], "args": [target, code]})
+        elif target in canonical and canonical[target] != target:
+            end = resolve(target)
+            chain = f"{target} -> {end}" if canonical.get(end, end) == end else f"{target} -> {canonical[target]} (loop)"
+            found.append({"id": "canonical_chain", "category": "indexability", "severity": "Medium", "url": raw[key], "args": [chain]})
+    return found
+
+def summarize_templates(template_index, pages, issues, top=3):
+    # 按模板汇总: 页面数、示例 URL 以及受影响页面最多的问题
+    page_template = {p["URL"]: p["Template"] for p in pages if p.get("Template")}
+    df = issues.frame()
+    df["Template"] = df["url"].map(page_template).astype(object)
+    counts = df.dropna(subset=["Template"]).drop_duplicates(["Template", "id", "url"]).groupby(["Template", "id"], observed=True).size()
+    affected = {}
+    for (tid, iid), n in counts.items(): affected.setdefault(tid, {})[iid] = int(n)
+    rows = []
+    for t in template_index.templates:
+        counts = sorted(((n, iid) for iid, n in affected.get(t["id"], {}).items()), reverse=True)
+        rows.append({
+            "Template": t["id"], "Pattern": t["pattern"], "Pages": t["pages"], "Sample": t["sample"],
+            "Issues": [[iid, n] for n, iid in counts[:top]]
+        })
+    return sorted(rows, key=lambda r: -r["Pages"])
 
-    return issues, sitemap_has_hreflang
-
-def analyze_page(url, content, status, sitemap_has_hreflang, baidu_mode=False):
-    soup = BeautifulSoup(content, 'html.parser')
-    issues = []
-    
-    title = soup.title.string.strip() if soup.title else None
-    desc = soup.find('meta', attrs={'name': 'description'})
-    desc_content = desc['content'].strip() if desc else None
-    h1 = soup.find('h1')
-    h1_content = h1.get_text().strip() if h1 else None
-    
-    can_tag = soup.find('link', attrs={'rel': 'canonical'})
-    can_url = can_tag['href'] if can_tag else None
-
-    if status == 200:
-        is_self_canonical = True
-        if can_url:
-            def norm_u(u): return u.split('#')[0].rstrip('/')
-            try:
-                abs_can = urljoin(url, can_url)
-                if norm_u(abs_can) != norm_u(url):
-                    is_self_canonical = False
-            except: pass
-
-        if not can_url:
-            issues.append({"id": "missing_canonical", "category": "indexability", "severity": "Medium", "url": url})
-            is_self_canonical = True
-
-        hreflangs = soup.find_all('link', hreflang=True)
-        if hreflangs:
-            has_x_default = False
-            invalid = []
-            pat = re.compile(r'^[a-z]{2}(-[a-zA-Z]{2})?$|x-default', re.IGNORECASE)
-            for link in hreflangs:
-                code = link.get('hreflang', '').strip()
-                if code.lower() == 'x-default': has_x_default = True
-                if not pat.match(code): invalid.append(code)
-            if invalid:
-                issues.append({"id": "hreflang_invalid", "category": "indexability", "severity": "High", "url": url, "args": [", ".join(invalid[:3])]})
-            if not has_x_default:
-                issues.append({"id": "hreflang_no_default", "category": "indexability", "severity": "Low", "url": url})
-        elif not sitemap_has_hreflang:
-             if is_self_canonical:
-                issues.append({"id": "missing_hreflang", "category": "indexability", "severity": "Low", "url": url})
-
-        if is_self_canonical:
-            if not soup.find('meta', attrs={'name': 'viewport'}):
-                issues.append({"id": "missing_viewport", "category": "technical", "severity": "Critical", "url": url})
-            
-            if not soup.find('script', type='application/ld+json'):
-                 path = urlparse(url).path.lower()
-                 rec = "BreadcrumbList"
-                 if path in ["/", ""]: rec = "Organization/WebSite"
-                 elif any(x in path for x in ["product", "shop"]): rec = "Product"
-                 elif any(x in path for x in ["blog", "news"]): rec = "Article"
-                 issues.append({"id": "missing_jsonld", "category": "technical", "severity": "Medium", "url": url, "args": [rec]})
-
-            if '_' in url: issues.append({"id": "url_underscore", "category": "technical", "severity": "Low", "url": url})
-            if any(c.isupper() for c in urlparse(url).path): issues.append({"id": "url_uppercase", "category": "technical", "severity": "Medium", "url": url})
-            
-            if soup.find('a', href=lambda x: x and x.lower().startswith('javascript:')):
-                issues.append({"id": "js_links", "category": "access", "severity": "High", "url": url}) 
-
-            imgs = soup.find_all('img')
-            missing_alt = 0
-            bad_alt = 0
-            cls_risk = 0
-            for img in imgs:
-                alt = img.get('alt', '').strip()
-                if not alt: missing_alt += 1
-                elif len(alt) < 3 or any(x in alt.lower() for x in ["image", "photo", "img"]): bad_alt += 1
-                if not img.get('width') or not img.get('height'): cls_risk += 1
-            
-            if missing_alt > 0: issues.append({"id": "missing_alt", "category": "image_ux", "severity": "Medium", "url": url})
-            if bad_alt > 0: issues.append({"id": "alt_bad_quality", "category": "image_ux", "severity": "Low", "url": url})
-            if cls_risk > 0: issues.append({"id": "cls_risk", "category": "cwv_performance", "severity": "Medium", "url": url})
-
-            links = soup.find_all('a', href=True)
-            bad_anchors = ["click here", "read more", "more"]
-            if any(a.get_text().strip().lower() in bad_anchors for a in links):
-                issues.append({"id": "anchor_bad_quality", "category": "access", "severity": "Low", "url": url})
-            
-            if not title: 
-                issues.append({"id": "missing_title", "category": "content", "severity": "High", "url": url})
-            else:
-                px_w = estimate_pixel_width(title)
-                if px_w < 200:
-                    issues.append({"id": "short_title", "category": "content", "severity": "Medium", "url": url, "evidence": title, "args": [int(px_w)]})
-                elif px_w > 600:
-                    issues.append({"id": "long_title", "category": "content", "severity": "Low", "url": url, "evidence": title, "args": [int(px_w)]})
-
-            if not desc_content: 
-                issues.append({"id": "missing_desc", "category": "content", "severity": "High", "url": url})
-            else:
-                px_w_d = estimate_pixel_width(desc_content)
-                if px_w_d < 400:
-                    issues.append({"id": "short_desc", "category": "content", "severity": "Low", "url": url, "evidence": desc_content, "args": [int(px_w_d)]})
-
-            if not h1_content: issues.append({"id": "missing_h1", "category": "content", "severity": "High", "url": url})
-
-            if (title and "not found" in title.lower()) or (soup.find('h1') and "not found" in soup.find('h1').get_text().lower()):
-                issues.append({"id": "soft_404", "category": "access", "severity": "Critical", "url": url})
-        
-        if baidu_mode:
-            keywords = soup.find('meta', attrs={'name': 'keywords'})
-            if not keywords or not keywords.get('content', '').strip():
-                 issues.append({"id": "missing_keywords", "category": "content", "severity": "Medium", "url": url})
-            
-            if "hm.baidu.com" not in str(soup):
-                 issues.append({"id": "missing_baidu_stats", "category": "technical", "severity": "Low", "url": url})
-            
-            if not soup.find('meta', attrs={'name': 'applicable-device'}):
-                 issues.append({"id": "missing_applicable_device", "category": "technical", "severity": "Medium", "url": url})
-            
-            has_no_transform = False
-            for meta in soup.find_all('meta'):
-                if meta.get('http-equiv', '').lower() == 'cache-control' and 'no-transform' in meta.get('content', '').lower():
-                    has_no_transform = True
-                    break
-            if not has_no_transform:
-                 issues.append({"id": "missing_no_transform", "category": "technical", "severity": "Medium", "url": url})
-            
-            page_text = soup.get_text()
-            if "ICP备" not in page_text and "ICP证" not in page_text:
-                 issues.append({"id": "missing_icp", "category": "technical", "severity": "High", "url": url})
-            
-            chinese_chars = len(re.findall(r'[\u4e00-\u9fa5]', page_text))
-            total_chars = len(page_text.strip())
-            if total_chars > 200 and (chinese_chars / total_chars) < 0.05:
-                 issues.append({"id": "content_not_chinese", "category": "content", "severity": "Medium", "url": url})
-
-
-    return {
-        "URL": url, 
-        "Status": status, 
-        "Title": title, 
-        "Description": desc_content,
-        "H1": h1_content,
-        "Canonical": can_url,
-        "Content_Hash": hashlib.md5(soup.get_text().encode('utf-8')).hexdigest()
-    }, issues
-
-def crawl_website(start_url, max_pages, lang, manual_robots, manual_sitemaps, psi_key, list_url=None, detail_url=None, check_robots=True, crawl_sitemap=True, allow_sub=False, allow_outside=False, manual_pages=None, baidu_mode=False):
+def crawl_website(start_url, max_pages, lang, manual_robots, manual_sitemaps, psi_key, list_url=None, detail_url=None, check_robots=True, crawl_sitemap=True, allow_sub=False, allow_outside=False, manual_pages=None, baidu_mode=False, concurrency=DEFAULT_CONCURRENCY, per_host_limit=DEFAULT_PER_HOST_LIMIT, resume=True, use_cache=True, max_page_mb=DEFAULT_MAX_PAGE_MB, url_policy=None, trap_limit=TRAP_PATTERN_LIMIT, analysis_workers=DEFAULT_ANALYSIS_WORKERS, dup_threshold=DEFAULT_DUP_THRESHOLD, url_list=None, list_id=None, discover_links=True, psi_strategies=("mobile",), psi_urls=None):
     visited = set()
-    seen_hashes = {} 
+    if max_pages is None: max_pages = float('inf')
+    dup_index = NearDuplicateIndex(dup_threshold)
+    field_index = FieldDuplicateIndex()
+    template_index = TemplateIndex()
+    dup_exempt = set()
     seen_urls = set()
+    pending_pages = [] # 尚未写入结果库与断点的页面, 每次保存后清空
+    all_issues = IssueTable()
     
-    queue = [start_url]
-    seen_urls.add(start_url)
-    if list_url and is_valid_url(list_url):
-         queue.append(list_url)
-         seen_urls.add(list_url)
-    if detail_url and is_valid_url(detail_url):
-         queue.append(detail_url)
-         seen_urls.add(detail_url)
-
-    if manual_pages:
-        for p in manual_pages:
-            if is_valid_url(p) and p not in seen_urls:
-                queue.append(p)
-                seen_urls.add(p)
-
-    results_data = []
-    all_issues = []
-    first_error = None
-    target_domain = None
+    url_policy = {**DEFAULT_URL_POLICY, **(url_policy or {})}
+    dns_before = DNS_CACHE.snapshot()
+    link_graph = LinkGraph()
+    def url_key(u): return canonicalize_url(u, url_policy)
+    # 列表模式按原样审计输入的每个 URL: 只按完整字符串去重, 不做规范化合并
+    def seen_key(u): return u if url_list is not None else url_key(u)
+
+    def index_duplicate(page_data):
+        # 已通过 canonical 指向其他 URL 的页面仍参与聚类, 但不单独报告, 也不参与标题/描述/H1 查重
+        can = page_data['Canonical']
+        if can and urljoin(page_data['URL'], can).split('#')[0].rstrip('/') != page_data['URL'].split('#')[0].rstrip('/'):
+            dup_exempt.add(page_data['URL'])
+        dup_index.add(page_data['URL'], int(page_data['SimHash'], 16))
+        if page_data['URL'] in dup_exempt: return []
+        return [
+            {"id": iid, "category": "content", "severity": "Low" if iid == "duplicate_h1" else "Medium", "url": page_data['URL'], "evidence": value, "meta": first_url}
+            for iid, value, first_url in field_index.add(page_data)
+        ]
     
-    start_netloc = urlparse(start_url).netloc.replace('www.', '')
-    start_path = urlparse(start_url).path
-    if not start_path.endswith('/'): start_path += '/'
+    progress_bar = session = cache = results = aux_pool = psi = None
+    try:
+        checkpoint, state = None, None
+        if resume:
+            checkpoint = CrawlCheckpoint.open(audit_key(
+                start_url, list_url, detail_url, manual_sitemaps, manual_pages,
+                check_robots, crawl_sitemap, allow_sub, allow_outside, baidu_mode, url_policy, list_id, discover_links
+            ))
+            state = checkpoint.load()
+        frontier = CrawlFrontier(journal=checkpoint)
+        trap_guard = TrapGuard(trap_limit, journal=checkpoint)
     
-    def clean_url(u): return u.split('?')[0].split('#')[0]
-
-    progress_bar = st.progress(0, text="Initializing...")
-    sitemap_has_hreflang = False
+        if state:
+            frontier.restore(state["frontier"])
+            trap_guard.restore(state["traps"])
+            for u in state["seen"]: seen_urls.add(seen_key(u))
+            all_issues = IssueTable(state["issues"])
+            link_graph.restore(state["nodes"], state["edges"])
+        elif url_list is None:
+            frontier.push(start_url, 0, SEED_PRIORITY)
+            seen_urls.add(url_key(start_url))
+            if list_url and is_valid_url(list_url) and url_key(list_url) not in seen_urls:
+                 frontier.push(list_url, 0, SEED_PRIORITY)
+                 seen_urls.add(url_key(list_url))
+            if detail_url and is_valid_url(detail_url) and url_key(detail_url) not in seen_urls:
+                 frontier.push(detail_url, 0, SEED_PRIORITY)
+                 seen_urls.add(url_key(detail_url))
+
+            if manual_pages:
+                for p in manual_pages:
+                    if is_valid_url(p) and url_key(p) not in seen_urls:
+                        frontier.push(p, 0, SEED_PRIORITY)
+                        seen_urls.add(url_key(p))
+
+        first_error = None
+        target_domain = None
     
-    try:
-        site_issues, sitemap_has_hreflang = check_site_level_assets(
-            start_url, lang, check_robots, crawl_sitemap, manual_sitemaps, baidu_mode
-        )
-        all_issues.extend(site_issues)
-        st.session_state['sitemap_hreflang_found'] = sitemap_has_hreflang
-    except Exception as e:
-        pass
-
-    if psi_key:
-        with st.spinner(TRANSLATIONS[lang]["psi_fetching"].format("Pages")):
-            targets = [("Home", start_url)]
-            if list_url and is_valid_url(list_url): targets.append(("List", list_url))
-            if detail_url and is_valid_url(detail_url): targets.append(("Detail", detail_url))
-            
-            for label, t_url in targets:
-                cwv_data = fetch_psi_data(t_url, psi_key)
-                if cwv_data and "error" not in cwv_data:
-                    if label == "Home": st.session_state['cwv_data'] = cwv_data
-                    all_issues.extend(check_cwv_issues(cwv_data, t_url, label=f"({label})"))
-
-    count = 0
-    headers = get_browser_headers()
+        start_netloc = urlparse(start_url).netloc.replace('www.', '')
+        start_path = urlparse(start_url).path
+        if not start_path.endswith('/'): start_path += '/'
+
+        progress_bar = st.progress(0, text="Initializing...")
+        sitemap_has_hreflang = False
+        concurrency = max(1, int(concurrency))
+        session = create_http_session(pool_size=concurrency)
+        cache = ResponseCache.open() if use_cache else None
+        results = ResultsStore.create()
+        if state:
+            # 断点中的页面逐行重建查重/模板索引, 并转写到新的结果库
+            def restored_pages():
+                for page in checkpoint.iter_pages():
+                    if page.get("Status") == 200 and page.get("SimHash"): index_duplicate(page)
+                    if page.get("Template"): template_index.add(page["URL"], int(page["Structure"], 16))
+                    yield page
+            results.append(restored_pages(), all_issues)
     
-    while queue and count < max_pages:
-        url = queue.pop(0)
-        visited.add(url)
-        
-        if any(x in url.lower() for x in ['/login', '/signin', '/admin', '/cart', '/account']):
-            continue
-
-        count += 1
-        progress_bar.progress(int(count/max_pages*100), text=f"Crawling ({count}/{max_pages}): {url}")
-        time.sleep(0.1)
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=10, allow_redirects=True, verify=False)
-            current_url = response.url 
-            
-            if count == 1 and url == start_url:
-                 start_netloc = urlparse(current_url).netloc.replace('www.', '')
-
-            final_status = response.status_code
-
-            if response.history:
-                chain_list = [r.url for r in response.history] + [current_url]
-                origin_netloc = urlparse(chain_list[0]).netloc.replace('www.', '')
-                chain_display_parts = []
-                for u in chain_list:
-                    u_obj = urlparse(u)
-                    u_netloc = u_obj.netloc.replace('www.', '')
-                    
-                    if u_netloc != origin_netloc:
-                        chain_display_parts.append(u) # Full URL for cross-domain
-                    else:
-                        p = u_obj.path
-                        if not p: p = "/"
-                        chain_display_parts.append(p) # Path for same domain
-
-                chain_str = " -> ".join(chain_display_parts)
-                all_issues.append({"id": "http_3xx", "category": "access", "severity": "Medium", "url": url, "args": [chain_str]})
-
-            if final_status >= 400:
-                is_5xx = final_status >= 500
-                all_issues.append({"id": "http_5xx" if is_5xx else "http_4xx", "category": "access", "severity": "Critical" if is_5xx else "High", "url": url, "args": [str(final_status)]})
-
-            content_type = response.headers.get('Content-Type', '').lower()
-            if 'text/html' in content_type:
-                # Double check for login via content
-                if 'type="password"' in response.text.lower():
-                     continue # Skip login page content check
-
-                page_data, page_issues = analyze_page(current_url, response.content, final_status, sitemap_has_hreflang, baidu_mode)
+        def link_scope(link):
+            # Enhanced Filtering Logic: (站内非静态资源, 位于起始目录内)
+            link_parsed = urlparse(link)
+            link_netloc = link_parsed.netloc.replace('www.', '')
+            link_path = link_parsed.path
+
+            # Check Domain
+            is_internal = False
+            if not link_netloc: is_internal = True # Relative
+            elif allow_sub:
+                is_internal = link_netloc.endswith(start_netloc) # Any subdomain
+            else:
+                is_internal = link_netloc == start_netloc # Strict match
+            if any(link.lower().endswith(ext) for ext in ['.jpg', '.png', '.pdf', '.zip', '.css', '.js', '.json', '.xml']): is_internal = False
+
+            # Check Path
+            path_ok = True
+            if not allow_outside:
+                if not link_path.startswith(start_path): path_ok = False
+            return is_internal, path_ok
+
+        def enqueue(link, depth, guard=True):
+            link_key = seen_key(link)
+            if link_key in seen_urls: return
+            seen_urls.add(link_key)
+            if guard and not trap_guard.allow(url_key(link)):
+                # 被拦截的链接同样记入断点, 续爬时不会再次计数或抓取
+                if checkpoint: checkpoint.record_seen(link)
+            else:
+                frontier.push(link, depth)
+                # 子域名抓取与列表模式会不断遇到新主机名, 入队时即后台预解析, 真正请求时 DNS 已在缓存中
+                if allow_sub or url_list is not None:
+                    parts = urlsplit(link)
+                    DNS_CACHE.prefetch(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+
+        url_source = iter(url_list) if url_list is not None else None
+        def refill():
+            # 列表模式: 队列将空时再从输入流读取下一批 URL, 已审计过的 (含断点恢复) 自动跳过
+            nonlocal url_source
+            while url_source is not None and len(frontier) < LIST_CHUNK // 2:
+                batch = list(islice(url_source, LIST_CHUNK))
+                if len(batch) < LIST_CHUNK: url_source = None
+                for u in batch:
+                    if is_valid_url(u): enqueue(u, 0, guard=False)
+
+        sitemap_hreflang = {}
+        def seed_from_sitemap(loc, lastmod, priority, alternates):
+            # Sitemap 记录只在此保存一份 (队列权重/孤立页用 frontier.sitemap_hints, hreflang 回链检查用 sitemap_hreflang),
+            # 并逐条记入断点; URL 边解析边写入抓取队列, 由 Sitemap 权重决定优先级
+            if not is_valid_url(loc): return
+            frontier.sitemap_hints[loc] = (priority, lastmod)
+            if alternates: sitemap_hreflang[loc] = alternates
+            if checkpoint: checkpoint.record_sitemap(loc, priority, lastmod, alternates)
+            if crawl_sitemap and discover_links and link_scope(loc) == (True, True): enqueue(loc, 1)
+
+        site_meta = {}
+        count = 0
+        aux_done = set()
+        if state:
+            # 断点续爬: 站点级检查与 PSI 结果已在问题列表中, 不再重复请求
+            meta = state["meta"]
+            count = meta.get("count", state["page_count"])
+            start_netloc = meta.get("start_netloc", start_netloc)
+            sitemap_has_hreflang = meta.get("sitemap_has_hreflang", False)
+            site_meta = meta.get("site_meta", {})
+            aux_done = set(meta.get("aux_done", ["site", "psi"]))
+            frontier.sitemap_hints = {u: (p, parse_sitemap_date(d)) for u, p, d, _ in state["sitemap"]}
+            sitemap_hreflang = {u: json.loads(alts) for u, _, _, alts in state["sitemap"] if alts}
+            st.session_state['sitemap_hreflang_found'] = sitemap_has_hreflang
+            st.session_state['cwv_data'] = meta.get("cwv_data")
+            st.info(TRANSLATIONS[lang]["resume_info"].format(state["page_count"], len(frontier)))
+
+        # 站点级检查 (Sitemap/Favicon/IP 归属地) 与 PSI 在后台线程中与页面抓取并行执行;
+        # 只有 robots.txt 需要先完成 (Crawl-delay 与 Sitemap 地址), Sitemap 中的 URL 经队列交给主线程入队
+        aux_pool = ThreadPoolExecutor(max_workers=4)
+        aux = {}
+        sitemap_queue = queue.Queue()
+        if "site" not in aux_done:
+            robots = check_robots_txt(f"{urlparse(start_url).scheme}://{urlparse(start_url).netloc}", check_robots, crawl_sitemap, baidu_mode, session, cache)
+            site_meta = dict(site_meta, crawl_delay=robots[1])
+            aux[aux_pool.submit(
+                check_site_level_assets, start_url, lang, check_robots, crawl_sitemap, manual_sitemaps, baidu_mode, session, cache,
+                lambda *record: sitemap_queue.put(record), robots
+            )] = ("site",)
+
+        psi = PSIClient(psi_key) if psi_key else None
+        psi_strategies = psi_strategies or PSI_STRATEGIES[:1]
+        def submit_psi(label, t_url):
+            pending = {(k[2], k[3]) for k in aux.values() if k[0] == "psi"}
+            for strategy in psi_strategies:
+                if f"psi:{strategy}:{t_url}" not in aux_done and (t_url, strategy) not in pending:
+                    aux[aux_pool.submit(psi.fetch, t_url, strategy)] = ("psi", label, t_url, strategy)
+
+        sampled_templates = set()
+        def sample_template(t):
+            # 每个页面模板只对首个页面测速一次, 结果代表该模板的所有页面
+            if not psi or t["id"] in sampled_templates or t["pages"] < PSI_TEMPLATE_MIN_PAGES: return
+            if len(sampled_templates) >= PSI_TEMPLATE_SAMPLES: return
+            sampled_templates.add(t["id"])
+            submit_psi(f"{t['id']} {t['pattern']}", t["sample"])
+
+        if psi:
+            # 旧断点记录的是 "psi:<label>", 视同已完成; 新断点按 (策略, URL) 记录
+            if "psi" not in aux_done:
+                targets = [("Home", start_url)]
+                if list_url and is_valid_url(list_url): targets.append(("List", list_url))
+                if detail_url and is_valid_url(detail_url): targets.append(("Detail", detail_url))
+                targets += [("URL", u) for u in dict.fromkeys(psi_urls or []) if is_valid_url(u)]
+                for label, t_url in targets: submit_psi(label, t_url)
+            for t in template_index.templates: sample_template(t)
+
+        def drain_sitemap_queue():
+            while True:
+                try: record = sitemap_queue.get_nowait()
+                except queue.Empty: return
+                seed_from_sitemap(*record)
+
+        def record_aux(future):
+            nonlocal sitemap_has_hreflang, site_meta
+            kind = aux.pop(future)
+            aux_done.add(kind[0] if kind[0] == "site" else f"psi:{kind[3]}:{kind[2]}")
+            try:
+                result = future.result()
+            except Exception:
+                return
+            if kind[0] == "site":
+                site_issues, sitemap_has_hreflang, checked_meta = result
+                all_issues.extend(site_issues)
+                site_meta = dict(checked_meta, crawl_delay=site_meta.get("crawl_delay"))
+                st.session_state['sitemap_hreflang_found'] = sitemap_has_hreflang
+            else:
+                _, label, t_url, strategy = kind
+                if result and "error" not in result:
+                    if label == "Home" and (strategy == "mobile" or not st.session_state.get('cwv_data')):
+                        st.session_state['cwv_data'] = result
+                    all_issues.extend(check_cwv_issues(result, t_url, label=f"({label}, {strategy})"))
+
+        host_limiter = HostLimiter(per_host_limit)
+        throttle = HostThrottle(
+            crawl_delays={urlparse(start_url).netloc: site_meta.get("crawl_delay")} if check_robots else None,
+            robots_delay=(lambda scheme, host: fetch_crawl_delay(scheme, host, session, cache)) if check_robots else None
+        )
+        throttle_retries = {}
+        in_flight = {}
+        analyzing = {}
+        first_done = bool(state)
+        processed = 0
+        # Sitemap 可能尚未解析完, 页面一律按 "Sitemap 无 hreflang" 分析, missing_hreflang 在抓取结束后再取舍
+        analysis_sig = audit_key(ANALYSIS_VERSION, baidu_mode)
+        max_page_bytes = int(max_page_mb * 1024 * 1024)
+
+        def save_checkpoint(status="running"):
+            # 新增页面写入结果库与断点后即从内存释放
+            if status == "running": results.append(pending_pages, all_issues)
+            if checkpoint:
+                checkpoint.save(pending_pages, all_issues, {
+                    "count": count - len(in_flight) - len(analyzing), "start_netloc": start_netloc,
+                    "sitemap_has_hreflang": sitemap_has_hreflang, "site_meta": site_meta,
+                    "aux_done": sorted(aux_done), "cwv_data": st.session_state.get('cwv_data')
+                }, status, link_graph)
+            pending_pages.clear()
+
+        def store_page(url, depth, current_url, final_status, page_data, page_issues, page_links):
+            page_data["Depth"] = depth
+
+            # Near-duplicate index (clusters are reported after the crawl); duplicate title/desc/h1 reported per page
+            if final_status == 200: all_issues.extend(index_duplicate(page_data))
+            if final_status == 200 and page_data.get("Structure"):
+                template = template_index.add(page_data["URL"], int(page_data["Structure"], 16))
+                page_data["Template"] = template["id"]
+                sample_template(template)
+
+            pending_pages.append(page_data)
+            all_issues.extend(page_issues)
+            # 列表模式不发现链接, 也不建链接图: 内存只随去重集合增长, 不随页面出链增长
+            if not discover_links: return
+            out_links = []
+
+            for href in page_links:
+                # Filter: No Fragment
+                raw_link = urljoin(current_url, href)
+                link = raw_link.split('#')[0] 
+                is_internal, path_ok = link_scope(link)
+                if is_internal:
+                    out_links.append(url_key(link))
+                    if path_ok: enqueue(link, depth + 1)
+
+            link_graph.add_links(url_key(current_url), out_links)
+
+        def record_analysis(url, depth, current_url, final_status, result):
+            page_data, page_issues, page_links = result
+            if cache: cache.store_analysis(url, analysis_sig, {"page": page_data, "issues": page_issues, "links": page_links})
+            store_page(url, depth, current_url, final_status, page_data, page_issues, page_links)
+
+        analysis_pool = create_analysis_pool(analysis_workers)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool, (analysis_pool or nullcontext()):
+            while frontier or in_flight or analyzing or url_source or aux or not sitemap_queue.empty():
+                drain_sitemap_queue()
+                refill()
+                # 首页返回前只派发一个请求, 以便先确定跳转后的真实域名
+                slots = concurrency if first_done else 1
+                backlog_full = analysis_pool is not None and len(analyzing) >= ANALYSIS_BACKLOG_PER_WORKER * analysis_workers
+                while frontier and count < max_pages and len(in_flight) < slots and not backlog_full:
+                    url, depth = frontier.pop()
+                    visited.add(url)
                 
-                # Deduplication & Data Storage
-                if final_status == 200:
-                    current_hash = page_data['Content_Hash']
-                    current_canonical = page_data['Canonical']
-                    current_clean = clean_url(current_url)
-                    
-                    if current_hash in seen_hashes:
-                        original_url = seen_hashes[current_hash]
-                        # Fix: Check if URL is actually different (avoid self-duplicate flagging)
-                        if current_url != original_url and not (current_canonical and current_canonical != current_url):
-                            all_issues.append({
-                                "id": "duplicate", "category": "indexability", 
-                                "severity": "High", "url": current_url, 
-                                "meta": original_url # Raw URL
-                            })
-                    else:
-                        seen_hashes[current_hash] = current_url
+                    if url_list is None and any(x in url.lower() for x in ['/login', '/signin', '/admin', '/cart', '/account']):
+                        frontier.done(url)
+                        continue
 
-                results_data.append(page_data)
-                all_issues.extend(page_issues)
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                for a in soup.find_all('a', href=True):
-                    # Filter: No Fragment
-                    raw_link = urljoin(current_url, a['href'])
-                    link = raw_link.split('#')[0] 
-                    
-                    # Enhanced Filtering Logic
-                    link_parsed = urlparse(link)
-                    link_netloc = link_parsed.netloc.replace('www.', '')
-                    link_path = link_parsed.path
-
-                    # Check Domain
-                    is_internal = False
-                    if not link_netloc: is_internal = True # Relative
-                    elif allow_sub:
-                        is_internal = link_netloc.endswith(start_netloc) # Any subdomain
+                    count += 1
+                    if max_pages == float('inf'):
+                        progress_bar.progress(min(100, int(count / (count + len(frontier) + (LIST_CHUNK if url_source else 0)) * 100)), text=f"Auditing ({count}): {url}")
                     else:
-                        is_internal = link_netloc == start_netloc # Strict match
+                        progress_bar.progress(int(count/max_pages*100), text=f"Crawling ({count}/{max_pages}): {url}")
+                    in_flight[pool.submit(fetch_page, url, session, host_limiter, throttle, cache, max_page_bytes)] = (url, count, depth)
 
-                    # Check Path
-                    path_ok = True
-                    if not allow_outside:
-                        if not link_path.startswith(start_path): path_ok = False
+                if not in_flight and not analyzing and not aux: break
+                # Sitemap 仍在解析时定期醒来, 把新发现的 URL 入队
+                done, _ = wait(list(in_flight) + list(analyzing) + list(aux), timeout=SITEMAP_POLL if aux else None, return_when=FIRST_COMPLETED)
+            
+                for future in done:
+                    processed += 1
+                    if future in aux:
+                        record_aux(future)
+                        continue
+                    if future in analyzing:
+                        url, seq, depth, current_url, final_status = analyzing.pop(future)
+                        requeued = False
+                        try:
+                            record_analysis(url, depth, current_url, final_status, future.result())
+                        except BrokenProcessPool:
+                            # 分析子进程异常退出: 后续页面改为在主进程内分析; 正文不在主进程保留, 该页重新入队抓取 (通常命中响应缓存)
+                            analysis_pool = None
+                            frontier.push(url, depth)
+                            count -= 1
+                            requeued = True
+                        except Exception as e:
+                            if seq == 1: first_error = str(e)
+                        finally:
+                            if not requeued: frontier.done(url)
+                        continue
+
+                    url, seq, depth = in_flight.pop(future)
+                    first_done = True
+                    handed_off = False
+                    try:
+                        response = future.result()
+                        if response.status_code in THROTTLE_STATUSES and throttle_retries.get(url, 0) < MAX_THROTTLE_RETRIES:
+                            # 被限流: 归还名额, 退避后重新入队
+                            throttle_retries[url] = throttle_retries.get(url, 0) + 1
+                            count -= 1
+                            frontier.push(url, depth, SEED_PRIORITY)
+                            handed_off = True
+                            continue
+                        current_url = response.url 
+                        if url_list is None:
+                            seen_urls.add(url_key(current_url))
+                            if checkpoint: checkpoint.record_seen(current_url)
                     
-                    if is_internal and path_ok and link not in seen_urls:
-                        if not any(link.lower().endswith(ext) for ext in ['.jpg', '.png', '.pdf', '.zip', '.css', '.js', '.json', '.xml']):
-                            seen_urls.add(link)
-                            queue.append(link)
-            else:
-                if count == 1: first_error = f"Content type: {content_type}"
-        except Exception as e:
-            if count == 1: first_error = str(e)
-            pass
+                        if seq == 1 and url == start_url:
+                             start_netloc = urlparse(current_url).netloc.replace('www.', '')
+
+                        final_status = response.status_code
+
+                        if response.history:
+                            chain_list = [r.url for r in response.history] + [current_url]
+                            origin_netloc = urlparse(chain_list[0]).netloc.replace('www.', '')
+                            chain_display_parts = []
+                            for u in chain_list:
+                                u_obj = urlparse(u)
+                                u_netloc = u_obj.netloc.replace('www.', '')
+                    
+                                if u_netloc != origin_netloc:
+                                    chain_display_parts.append(u) # Full URL for cross-domain
+                                else:
+                                    p = u_obj.path
+                                    if not p: p = "/"
+                                    chain_display_parts.append(p) # Path for same domain
+
+                            chain_str = " -> ".join(chain_display_parts)
+                            if discover_links: link_graph.add_links(url_key(url), [url_key(current_url)])
+                            all_issues.append({"id": "http_3xx", "category": "access", "severity": "Medium", "url": url, "args": [chain_str]})
+
+                        if final_status >= 400:
+                            is_5xx = final_status >= 500
+                            all_issues.append({"id": "http_5xx" if is_5xx else "http_4xx", "category": "access", "severity": "Critical" if is_5xx else "High", "url": url, "args": [str(final_status)]})
+
+                        content_type = response.headers.get('Content-Type', '').lower()
+                        if 'text/html' in content_type:
+                            # Double check for login via content
+                            if 'type="password"' in response.text.lower():
+                                 continue # Skip login page content check
+
+                            if getattr(response, 'truncated', False):
+                                all_issues.append({"id": "page_too_large", "category": "technical", "severity": "Medium", "url": url, "args": [max_page_mb]})
+
+                            cached = cache.get_analysis(url, analysis_sig) if getattr(response, 'from_cache', False) else None
+                            if cached:
+                                store_page(url, depth, current_url, final_status, cached["page"], cached["issues"], cached["links"])
+                            elif analysis_pool:
+                                # 解析与规则检查交给进程池, 与后续抓取重叠执行
+                                args = (current_url, response.content, final_status, False, baidu_mode)
+                                analyzing[analysis_pool.submit(process_page, *args)] = (url, seq, depth, current_url, final_status)
+                                handed_off = True
+                            else:
+                                record_analysis(url, depth, current_url, final_status, process_page(current_url, response.content, final_status, False, baidu_mode))
+                        else:
+                            if seq == 1: first_error = f"Content type: {content_type}"
+                    except Exception as e:
+                        if seq == 1: first_error = str(e)
+                        pass
+                    finally:
+                        if not handed_off: frontier.done(url)
+
+                if processed >= CHECKPOINT_EVERY:
+                    save_checkpoint()
+                    processed = 0
     
-    progress_bar.empty()
-    if not results_data and first_error: return None, None, first_error
-    return results_data, all_issues, None
+        # 剩余页面落盘, 之后的全站检查都从结果库逐行读取
+        save_checkpoint()
+        if sitemap_has_hreflang: all_issues.drop("missing_hreflang")
+        all_issues.extend(trap_guard.issues())
+        all_issues.extend(check_cross_page_signals(results.iter_pages(), all_issues, url_key, sitemap_hreflang))
+        if discover_links:
+            all_issues.extend(apply_link_metrics(
+                link_graph, results, url_key, start_url, frontier.sitemap_hints,
+                check_orphans=not frontier
+            ))
+        for cluster in dup_index.clusters():
+            for u in cluster[1:]:
+                if u in dup_exempt: continue
+                all_issues.append({
+                    "id": "duplicate", "category": "indexability", 
+                    "severity": "High", "url": u, 
+                    "meta": cluster[0] # Raw URL
+                })
+        st.session_state['templates'] = summarize_templates(template_index, results.iter_pages(), all_issues)
+        results.finish(all_issues)
+        page_count = results.page_count()
+        if page_count: st.session_state['results_path'] = results.path
+        save_checkpoint("done")
+        st.session_state['crawl_rates'] = throttle.stats()
+        st.session_state['dns_stats'] = DNS_CACHE.stats(dns_before)
+        # 页面与问题都已在结果库中, 只返回页面数与问题汇总
+        if not page_count and first_error: return 0, None, first_error
+        return page_count, all_issues.summary, None
+    finally:
+        # Streamlit 停止或重跑时会在脚本线程中抛出异常打断抓取; 连接、线程池与进度条统一在此释放, 断点保留最近一次落盘的进度
+        if aux_pool: aux_pool.shutdown(wait=False, cancel_futures=True)
+        for resource in (psi, results, checkpoint, cache, session):
+            if resource: resource.close()
+        if progress_bar: progress_bar.empty()
 
 # --- Level 7: 全局 PPT 绘图函数 ---
 def set_font(font_obj, size, bold=False, color=None, lang="zh"):
@@ -1439,9 +3073,9 @@ def create_styled_pptx(slides_data, lang):
         
         for idx, url in enumerate(s['examples'][:4]): 
             p = tf.add_paragraph()
-            if s['id'] == 'duplicate' and "Duplicate Group:" in url:
-                 parts = url.split("\n")
-                 p.text = f"Group {idx+1}:\n   • {parts[1].replace('- ', '').strip()}\n   • {parts[2].replace('- ', '').strip()}"
+            if "Duplicate Group:" in url:
+                 parts = [u.replace('- ', '', 1).strip() for u in url.split("\n")[1:]]
+                 p.text = f"Group {idx+1} ({len(parts)}):\n" + "\n".join(f"   • {u}" for u in parts[:3])
                  set_font(p.font, 10, False, RGBColor(80, 80, 80), lang)
             else:
                  p.text = f"• {url}"
@@ -1480,11 +3114,13 @@ def create_styled_pptx(slides_data, lang):
     return out
 
 # --- 7. UI Logic (No indentation) ---
-if 'audit_data' not in st.session_state: st.session_state['audit_data'] = None
-if 'audit_issues' not in st.session_state: st.session_state['audit_issues'] = []
+if 'results_path' not in st.session_state: st.session_state['results_path'] = None
 if 'language' not in st.session_state: st.session_state['language'] = "zh"
 if 'cwv_data' not in st.session_state: st.session_state['cwv_data'] = None
 if 'sitemap_hreflang_found' not in st.session_state: st.session_state['sitemap_hreflang_found'] = False
+if 'crawl_rates' not in st.session_state: st.session_state['crawl_rates'] = {}
+if 'dns_stats' not in st.session_state: st.session_state['dns_stats'] = {}
+if 'templates' not in st.session_state: st.session_state['templates'] = []
 
 lang = st.session_state['language']
 ui = TRANSLATIONS[lang]
@@ -1506,16 +3142,20 @@ with st.sidebar:
     menu_key = keys[opts.index(sel)]
     
     st.divider()
-    if st.session_state['audit_data']:
-        st.success(ui["cache_info"].format(len(st.session_state['audit_data'])))
+    results = open_results()
+    audited_pages = results.page_count() if results else 0
+    if audited_pages:
+        st.success(ui["cache_info"].format(audited_pages))
         st.markdown(f"**{ui['sitemap_status_title']}**")
         if st.session_state['sitemap_hreflang_found']: st.caption(ui["sitemap_found_href"])
         else: st.caption(ui["sitemap_no_href"])
         
         if st.button(ui["clear_data"]):
-            st.session_state['audit_data'] = None
-            st.session_state['audit_issues'] = []
+            st.session_state['results_path'] = None
             st.session_state['cwv_data'] = None
+            st.session_state['crawl_rates'] = {}
+            st.session_state['dns_stats'] = {}
+            st.session_state['templates'] = []
             st.rerun()
 
 if menu_key == "input":
@@ -1531,46 +3171,80 @@ if menu_key == "input":
         check_robots_flag = st.checkbox(ui["check_robots_label"], value=True)
         crawl_sitemap_flag = st.checkbox(ui["crawl_sitemap_label"], value=True)
         baidu_mode_flag = st.checkbox(ui["baidu_mode_label"], value=False)
+        resume_flag = st.checkbox(ui["resume_label"], value=True, help=ui["resume_help"])
+        cache_flag = st.checkbox(ui["http_cache_label"], value=True, help=ui["http_cache_help"])
+        max_page_mb = st.number_input(ui["max_page_mb_label"], min_value=1, max_value=100, value=DEFAULT_MAX_PAGE_MB)
+        uc1, uc2, uc3 = st.columns(3)
+        with uc1: ignore_slash_flag = st.checkbox(ui["ignore_trailing_slash_label"], value=DEFAULT_URL_POLICY["ignore_trailing_slash"])
+        with uc2: ignore_case_flag = st.checkbox(ui["ignore_case_label"], value=DEFAULT_URL_POLICY["ignore_case"])
+        with uc3: trap_limit = st.number_input(ui["trap_limit_label"], min_value=5, max_value=10000, value=TRAP_PATTERN_LIMIT, help=ui["trap_limit_help"])
+        url_policy = {"ignore_trailing_slash": ignore_slash_flag, "ignore_case": ignore_case_flag}
+        cc1, cc2 = st.columns(2)
+        with cc1: concurrency = st.number_input(ui["concurrency_label"], min_value=1, max_value=64, value=DEFAULT_CONCURRENCY)
+        with cc2: per_host_limit = st.number_input(ui["per_host_limit_label"], min_value=1, max_value=32, value=DEFAULT_PER_HOST_LIMIT)
+        analysis_workers = st.number_input(ui["analysis_workers_label"], min_value=1, max_value=64, value=DEFAULT_ANALYSIS_WORKERS, help=ui["analysis_workers_help"])
+        dup_threshold = st.slider(ui["dup_threshold_label"], min_value=0.80, max_value=1.0, value=DEFAULT_DUP_THRESHOLD, step=0.01, help=ui["dup_threshold_help"])
         manual_sitemaps_text = st.text_area(ui.get("manual_sitemaps", "Manual Sitemaps"), placeholder="https://example.com/sitemap.xml")
         manual_sitemaps = [s.strip() for s in manual_sitemaps_text.split('\n') if s.strip()]
         manual_pages_text = st.text_area(ui.get("manual_pages_label", "Manual Pages"), placeholder="https://example.com/page1")
         manual_pages = [s.strip() for s in manual_pages_text.split('\n') if s.strip()]
+        url_list_file = st.file_uploader(ui["url_list_label"], type=["txt", "csv", "xml", "gz"], help=ui["url_list_help"])
         sitemap_content_text = st.text_area(ui.get("sitemap_content_label", "Paste Sitemap Content"), height=150)
+        geoip_file = st.file_uploader(ui["geoip_label"], type=["csv"], help=ui["geoip_help"])
+        if geoip_file is not None and st.session_state.get('geoip_file_id') != geoip_file.file_id:
+            # 每次重跑脚本都会带上已上传的文件, 只在文件变化时写入
+            os.makedirs(os.path.dirname(GEOIP_DB_PATH) or ".", exist_ok=True)
+            with open(GEOIP_DB_PATH, "wb") as f: f.write(geoip_file.getvalue())
+            st.session_state['geoip_file_id'] = geoip_file.file_id
+        geoip = get_geoip_table()
+        if geoip: st.caption(ui["geoip_loaded"].format(sum(len(t[0]) for t in geoip.tables.values())))
 
     
     with st.expander(ui.get("psi_settings", "Google PSI")):
         psi_key = st.text_input(ui.get("psi_api_key_label", "API Key"), type="password", help=ui.get("psi_api_help", ""))
         psi_list_url = st.text_input(ui.get("psi_list_url_label", "List URL"))
         psi_detail_url = st.text_input(ui.get("psi_detail_url_label", "Detail URL"))
+        psi_strategies = st.multiselect(ui.get("psi_strategies_label", "Strategy"), PSI_STRATEGIES, default=["mobile"])
+        psi_urls = [u.strip() for u in st.text_area(ui.get("psi_urls_label", "URLs"), help=ui.get("psi_urls_help", "")).splitlines() if u.strip()]
         st.caption(ui["psi_get_key"])
 
     if st.button(ui["start_btn"], type="primary"):
         if not target_url or not is_valid_url(target_url): 
             st.error(ui["error_url"])
         else:
-            with st.spinner(ui["spinner_crawl"].format(max_pages)):
+            list_kwargs = {}
+            if url_list_file is not None:
+                url_list_file.seek(0)
+                list_kwargs = {"url_list": iter_url_list(url_list_file), "list_id": (url_list_file.name, url_list_file.size), "discover_links": False}
+            with st.spinner(ui["spinner_list"].format(url_list_file.name) if list_kwargs else ui["spinner_crawl"].format(max_pages)):
                 # Handle pasted sitemap content
                 if sitemap_content_text:
-                    extracted_urls = re.findall(r'<loc>\s*(https?://[^<]+)\s*</loc>', sitemap_content_text)
-                    if manual_pages is None: manual_pages = []
-                    manual_pages.extend(extracted_urls)
-
-                data, issues, error_msg = crawl_website(
-                    target_url, max_pages, lang, None, manual_sitemaps, psi_key, 
+                    # 粘贴内容同样按 Sitemap 协议流式解析; 若是索引文件, 子 Sitemap 交给爬虫继续展开
+                    try:
+                        for kind, loc, _, _, _ in iter_sitemap_records(BytesIO(sitemap_content_text.strip().encode('utf-8'))):
+                            if not is_valid_url(loc): continue
+                            if kind == "sitemap": manual_sitemaps.append(loc)
+                            else: manual_pages.append(loc)
+                    except ET.ParseError:
+                        pass
+
+                page_count, _, error_msg = crawl_website(
+                    target_url, None if list_kwargs else max_pages, lang, None, manual_sitemaps, psi_key, 
                     psi_list_url, psi_detail_url, check_robots_flag, crawl_sitemap_flag,
-                    allow_sub, allow_out, manual_pages, baidu_mode_flag
+                    allow_sub, allow_out, manual_pages, baidu_mode_flag,
+                    concurrency, per_host_limit, resume_flag, cache_flag, max_page_mb,
+                    url_policy, trap_limit, analysis_workers, dup_threshold,
+                    psi_strategies=psi_strategies, psi_urls=psi_urls, **list_kwargs
                 )
-                if not data:
+                if not page_count:
                     st.error(ui["error_no_data"].format(error_msg or "Unknown Error"))
                 else:
-                    st.session_state['audit_data'] = data
-                    st.session_state['audit_issues'] = issues
-                    st.success(ui["success_audit"].format(len(data)))
+                    st.success(ui["success_audit"].format(page_count))
                     st.balloons()
 
 elif menu_key == "dashboard":
     st.header(ui["dashboard_header"])
-    if not st.session_state['audit_data']: st.warning(ui["warn_no_data"])
+    if not audited_pages: st.warning(ui["warn_no_data"])
     else:
         if st.session_state.get('cwv_data'):
             c = st.session_state['cwv_data']
@@ -1587,15 +3261,15 @@ elif menu_key == "dashboard":
             c4.metric("FCP", f"{c['FCP']:.2f}s")
             st.divider()
 
-        df = pd.DataFrame(st.session_state['audit_data'])
-        issues = st.session_state['audit_issues']
-        total = len(issues)
+        # 只读取问题汇总, 不把全部页面与问题读入内存
+        summary = results.summary()
+        total = summary.total
         score = max(0, 100 - int(total * 0.5))
-        critical = len([i for i in issues if i['severity'] == 'Critical'])
+        critical = summary.totals("severity").get("Critical", 0)
         
         k1, k2, k3, k4 = st.columns(4)
         k1.metric(ui["kpi_health"], f"{score}/100")
-        k2.metric(ui["kpi_pages"], str(len(df)))
+        k2.metric(ui["kpi_pages"], str(audited_pages))
         k3.metric(ui["kpi_issues"], str(total), delta_color="inverse")
         k4.metric(ui["kpi_critical"], str(critical), delta_color="inverse")
         
@@ -1603,47 +3277,53 @@ elif menu_key == "dashboard":
         c1, c2 = st.columns(2)
         with c1:
             st.subheader(ui["chart_issues"])
-            if issues:
-                issue_counts = pd.DataFrame(issues)['id'].value_counts().reset_index()
-                issue_counts.columns = ['id', 'count']
+            if total:
+                issue_counts = pd.DataFrame(sorted(summary.counts().items(), key=lambda x: -x[1]), columns=['id', 'count'])
                 issue_counts['name'] = issue_counts['id'].apply(lambda x: get_translated_text(x, lang)['title'])
                 st.bar_chart(issue_counts.set_index('name'))
             else: st.info(ui["chart_no_issues"])
         with c2:
             st.subheader(ui["chart_status"])
-            if not df.empty: st.bar_chart(df['Status'].value_counts())
+            st.bar_chart(pd.Series(results.status_counts(), name="count"))
+
+        if st.session_state.get('templates'):
+            st.divider()
+            st.subheader(ui["template_title"])
+            st.caption(ui["template_caption"])
+            st.dataframe(pd.DataFrame([
+                {**t, "Issues": ", ".join(f"{get_translated_text(iid, lang)['title']} ({n})" for iid, n in t["Issues"])}
+                for t in st.session_state['templates']
+            ]), use_container_width=True, hide_index=True)
+
+        if st.session_state.get('crawl_rates'):
+            st.divider()
+            st.subheader(ui["crawl_rate_title"])
+            for host, r in st.session_state['crawl_rates'].items():
+                st.caption(ui["crawl_rate_caption"].format(host, r['rate'], r['requests'], r['throttled']))
+
+        if st.session_state.get('dns_stats'):
+            st.divider()
+            st.subheader(ui["dns_title"])
+            for host, d in st.session_state['dns_stats'].items():
+                st.caption(ui["dns_caption"].format(host, d['lookups'], d['avg_ms'], d['hits'], d['failures']))
 
 elif menu_key == "matrix":
     st.header(ui["matrix_header"])
-    if not st.session_state['audit_data']: st.warning(ui["warn_no_data"])
+    if not audited_pages: st.warning(ui["warn_no_data"])
     else:
-        df = pd.DataFrame(st.session_state['audit_data'])
-        st.dataframe(df, use_container_width=True)
-        st.download_button(ui["download_csv"], df.to_csv().encode('utf-8'), "audit.csv")
+        # 分页读取, 每次只加载当前页
+        n_pages = -(-audited_pages // MATRIX_PAGE_ROWS)
+        page_no = st.number_input(ui["matrix_page_label"].format(n_pages), min_value=1, max_value=n_pages, value=1) if n_pages > 1 else 1
+        st.dataframe(results.pages_frame((page_no - 1) * MATRIX_PAGE_ROWS, MATRIX_PAGE_ROWS), use_container_width=True)
+        st.download_button(ui["download_csv"], results.pages_csv, "audit.csv")
 
 elif menu_key == "ppt":
     st.header(ui["ppt_header"])
-    if not st.session_state['audit_issues']: st.warning(ui["warn_no_data"])
+    summary = results.summary() if results else None
+    if not summary or not summary.total: st.warning(ui["warn_no_data"])
     else:
-        raw = st.session_state['audit_issues']
-        grouped = {}
-        for i in raw:
-            iid = i['id']
-            if iid not in grouped:
-                grouped[iid] = {
-                    "id": iid, "category": i['category'], "severity": i['severity'],
-                    "count": 0, "examples": [], "args": i.get('args', []),
-                    "example_evidence": i.get("evidence", "")
-                }
-            grouped[iid]['count'] += 1
-            if len(grouped[iid]['examples']) < 5:
-                if iid == "duplicate" and "meta" in i:
-                     # Clean grouping for duplicate
-                     grouped[iid]['examples'].append(f"Duplicate Group:\n- {i['url']}\n- {i['meta']}")
-                else:
-                     grouped[iid]['examples'].append(i['url'])
-        
-        slides = sorted(list(grouped.values()), key=lambda x: (
+        # 幻灯片直接来自抓取时维护的问题汇总, 翻页重跑时不再遍历原始问题
+        slides = sorted(summary.slides(), key=lambda x: (
             CATEGORY_ORDER.index(x['category']),
             get_issue_priority(x['id']),
             SEVERITY_ORDER.get(x['severity'], 3)
@@ -1730,8 +3410,8 @@ elif menu_key == "ppt":
                 st.markdown(f"**{ui['ppt_examples']}**")
                 for ex in s['examples']:
                      if "Duplicate Group:" in ex:
-                         parts = ex.split("\n")
-                         st.markdown(f"- **Group:**\n  - `{parts[1].replace('- ', '').strip()}`\n  - `{parts[2].replace('- ', '').strip()}`")
+                         parts = [p.replace('- ', '', 1).strip() for p in ex.split("\n")[1:]]
+                         st.markdown("- **Group:**\n" + "\n".join(f"  - `{p}`" for p in parts))
                      else:
                          st.markdown(f"- `{ex}`")
 
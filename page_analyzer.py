@@ -0,0 +1,438 @@
+# 页面解析与规则检查 (Analysis Layer)
+# 不依赖 Streamlit, 可在分析子进程中直接导入
+import hashlib
+import re
+from functools import cached_property
+from itertools import combinations
+import numpy as np
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+
+def get_content_hash(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+# --- 近似重复检测 (SimHash + LSH) ---
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+DEFAULT_DUP_THRESHOLD = 0.95
+DUP_BAND_BITS = 16
+TOKEN_PAT = re.compile(r'[\u4e00-\u9fa5]|\w+')
+
+def simhash(text, k=SHINGLE_SIZE):
+    # 以词 (中文按字) 的 k-gram 作为特征; 时间戳、推荐位等局部差异只影响少量位
+    return simhash_tokens(TOKEN_PAT.findall(text.lower()), k)
+
+def simhash_tokens(tokens, k=SHINGLE_SIZE):
+    if not tokens: return 0
+    weights = {}
+    for i in range(max(1, len(tokens) - k + 1)):
+        s = ' '.join(tokens[i:i + k])
+        weights[s] = weights.get(s, 0) + 1
+    # 各特征的 64 位哈希展开为 (n, 64) 位矩阵 (列按高位在前), 每一位的 ±w 加权和 = 2 * (w · bits) - sum(w)
+    digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in weights)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    w = np.fromiter(weights.values(), dtype=np.int64, count=len(weights))
+    v = 2 * (w @ bits) - w.sum()
+    return int.from_bytes(np.packbits(v > 0).tobytes(), 'big')
+
+class NearDuplicateIndex:
+    # 汉明距离 <= k 的两个指纹按鸽巢原理至少有一段差异 <= k // 段数: 分段建桶, 只比较探测到的同桶候选.
+    # 段数为 k+1 (各段须完全相同) 但至少 DUP_BAND_BITS 位宽; 阈值较低时改为少量宽段 + 多探针 (查询该半径内的所有桶),
+    # 桶不会因段太窄而退化成全量比较. 命中的页面用并查集合并成簇, 代表页为簇内最先入库的 URL
+    def __init__(self, threshold=DEFAULT_DUP_THRESHOLD):
+        self.max_distance = max(0, int(SIMHASH_BITS * (1 - threshold)))
+        n = min(self.max_distance + 1, SIMHASH_BITS // DUP_BAND_BITS)
+        bounds = [SIMHASH_BITS * i // n for i in range(n + 1)]
+        self.bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        width = max(hi - lo for lo, hi in zip(bounds, bounds[1:]))
+        self.probes = [sum(1 << b for b in c) for r in range(self.max_distance // n + 1) for c in combinations(range(width), r)]
+        self.buckets = [{} for _ in self.bands]
+        self.fingerprints = {}
+        self.parent = {}
+        self.order = {}
+
+    def _find(self, key):
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def _union(self, a, b):
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb: return
+        if self.order[rb] < self.order[ra]: ra, rb = rb, ra
+        self.parent[rb] = ra
+
+    def add(self, key, fingerprint):
+        # 返回所属簇的代表 URL, 未命中任何已有页面时返回 None
+        if key in self.fingerprints: return None
+        self.fingerprints[key] = fingerprint
+        self.parent[key] = key
+        self.order[key] = len(self.order)
+        matched = False
+        checked = set()
+        for (shift, mask), bucket in zip(self.bands, self.buckets):
+            value = (fingerprint >> shift) & mask
+            for probe in self.probes:
+                for other in bucket.get(value ^ probe, ()):
+                    if other in checked: continue
+                    checked.add(other)
+                    if bin(fingerprint ^ self.fingerprints[other]).count('1') <= self.max_distance:
+                        self._union(key, other)
+                        matched = True
+            bucket.setdefault(value, []).append(key)
+        return self._find(key) if matched else None
+
+    def clusters(self):
+        groups = {}
+        for key in self.order:
+            groups.setdefault(self._find(key), []).append(key)
+        return [g for g in groups.values() if len(g) > 1]
+
+# --- 页面模板聚类 (URL 模式 + DOM 结构指纹) ---
+DEFAULT_TEMPLATE_THRESHOLD = 0.85
+URL_NUM_PAT = re.compile(r'^\d+$')
+URL_ID_PAT = re.compile(r'^(?=.*\d)(?:[0-9a-f-]{8,}|[A-Za-z0-9_]{16,})$', re.IGNORECASE)
+URL_SLUG_PAT = re.compile(r'^[^-]+-[^-]+-.+$')
+
+def url_pattern(url):
+    # /p/12345/red-cotton-shirt-xl.html?color=1 -> /p/{n}/{slug}.html?color
+    parsed = urlparse(url)
+    parts = []
+    for seg in parsed.path.split('/'):
+        stem, dot, ext = seg.rpartition('.') if '.' in seg else (seg, '', '')
+        if URL_NUM_PAT.match(stem): stem = '{n}'
+        elif URL_ID_PAT.match(stem): stem = '{id}'
+        elif URL_SLUG_PAT.match(stem) or any(c.isdigit() for c in stem): stem = '{slug}'
+        parts.append(stem + dot + ext)
+    query = '&'.join(sorted({k.split('=')[0] for k in parsed.query.split('&') if k}))
+    return '/'.join(parts) + ('?' + query if query else '')
+
+def structure_fingerprint(page):
+    # 以 "标签.首个 class" 序列的 k-gram 计算 SimHash; 连续重复的兄弟结构 (商品卡片、列表项) 折叠为一个,
+    # 因此 20 条与 50 条商品的列表页仍落在同一模板
+    body = page.soup.body or page.soup
+    tokens = []
+    for el in body.descendants:
+        if not el.name or el.name in ('script', 'style', 'noscript'): continue
+        cls = el.get('class')
+        token = el.name + ('.' + cls[0] if cls else '')
+        if not tokens or tokens[-1] != token: tokens.append(token)
+    return simhash_tokens(tokens)
+
+class TemplateIndex:
+    # 在线聚类: 先与同 URL 模式的模板比较结构指纹, 再与其他模板比较 (不同 URL 风格的同一模板);
+    # 模板数量通常只有几十个, 线性比较即可
+    def __init__(self, threshold=DEFAULT_TEMPLATE_THRESHOLD):
+        self.max_distance = max(0, int(SIMHASH_BITS * (1 - threshold)))
+        self.templates = []
+        self.by_pattern = {}
+        self.members = {}
+
+    def _match(self, candidates, fingerprint):
+        best = None
+        for t in candidates:
+            d = bin(fingerprint ^ t["fingerprint"]).count('1')
+            if d <= self.max_distance and (best is None or d < best[0]): best = (d, t)
+        return best[1] if best else None
+
+    def add(self, url, fingerprint):
+        # 返回模板记录 {"id", "pattern", "fingerprint", "sample", "pages"}
+        if url in self.members: return self.templates[self.members[url]]
+        pattern = url_pattern(url)
+        same = self.by_pattern.get(pattern, [])
+        t = self._match(same, fingerprint) or self._match(self.templates, fingerprint)
+        if t is None:
+            t = {"id": f"T{len(self.templates) + 1}", "pattern": pattern, "fingerprint": fingerprint, "sample": url, "pages": 0, "patterns": {}}
+            self.templates.append(t)
+        if t not in same: self.by_pattern.setdefault(pattern, []).append(t)
+        t["pages"] += 1
+        # 模板的展示模式取成员中最常见的 URL 模式 (首个页面可能是首页等特例)
+        t["patterns"][pattern] = t["patterns"].get(pattern, 0) + 1
+        if t["patterns"][pattern] > t["patterns"].get(t["pattern"], 0): t["pattern"] = pattern
+        self.members[url] = int(t["id"][1:]) - 1
+        return t
+
+# --- 跨页面重复字段 (标题/描述/H1) ---
+DUPLICATE_FIELDS = (("Title", "duplicate_title"), ("Description", "duplicate_meta_desc"), ("H1", "duplicate_h1"))
+
+class FieldDuplicateIndex:
+    # 规范化后的字段值 -> 首个使用该值的 URL, 每个页面 O(1) 查表
+    def __init__(self, fields=DUPLICATE_FIELDS):
+        self.fields = fields
+        self.first = {field: {} for field, _ in fields}
+
+    def add(self, page_data):
+        # 返回 (issue_id, 字段原值, 首个 URL) 列表
+        hits = []
+        for field, iid in self.fields:
+            value = page_data.get(field)
+            if not value: continue
+            key = ' '.join(value.split()).lower()
+            first_url = self.first[field].setdefault(key, page_data['URL'])
+            if first_url != page_data['URL']: hits.append((iid, value, first_url))
+        return hits
+
+def estimate_pixel_width(text, font_size=18):
+    if not text: return 0
+    width = 0
+    for char in text:
+        if ord(char) > 127: 
+            width += font_size
+        elif char.isupper():
+            width += font_size * 0.7 
+        else:
+            width += font_size * 0.55 
+    return width
+
+class ParsedPage:
+    # 每个页面只用 lxml 解析一次, 规则检查与链接提取共用; 文本与 HTML 按需计算且最多一次
+    def __init__(self, content):
+        self.content = content
+        self.soup = BeautifulSoup(content, 'lxml')
+        self._index = {}
+        self._indexed = set()
+
+    @cached_property
+    def text(self):
+        return self.soup.get_text()
+
+    @cached_property
+    def html(self):
+        if isinstance(self.content, str): return self.content
+        return self.content.decode(self.soup.original_encoding or 'utf-8', errors='replace')
+
+    def index(self, names):
+        # 一次遍历 DOM, 按标签名收集元素 (保持文档顺序); 已收集过的标签不再遍历
+        missing = set(names) - self._indexed
+        if missing:
+            for el in self.soup.descendants:
+                if el.name in missing: self._index.setdefault(el.name, []).append(el)
+            self._indexed |= missing
+
+    def elements(self, name):
+        self.index((name,))
+        return self._index.get(name, [])
+
+    def links(self):
+        return [a['href'] for a in self.elements('a') if a.has_attr('href')]
+
+# --- 规则注册表 ---
+# 每条规则声明所需标签与适用范围, 引擎只遍历一次 DOM 收集这些标签后依次执行规则
+# scope: "page" 所有 200 页面; "canonical" 仅自引用 canonical 的页面; "baidu" 百度模式
+class Rule:
+    def __init__(self, check, tags, scope):
+        self.check = check
+        self.tags = frozenset(tags)
+        self.scope = scope
+
+RULES = []
+BASE_TAGS = ('title', 'meta', 'h1', 'link', 'a')
+
+def rule(*tags, scope="canonical"):
+    def register(check):
+        RULES.append(Rule(check, tags, scope))
+        return check
+    return register
+
+def _attrs_match(el, attrs):
+    for k, v in attrs.items():
+        val = el.get(k)
+        if v is True:
+            if val is None: return False
+        elif isinstance(val, list):
+            if v not in val: return False
+        elif val != v: return False
+    return True
+
+class PageContext:
+    def __init__(self, url, status, page, sitemap_has_hreflang, baidu_mode):
+        self.url = url
+        self.status = status
+        self.page = page
+        self.sitemap_has_hreflang = sitemap_has_hreflang
+        self.baidu_mode = baidu_mode
+        self.is_self_canonical = True
+
+    def find_all(self, tag, **attrs):
+        return [el for el in self.page.elements(tag) if _attrs_match(el, attrs)]
+
+    def find(self, tag, **attrs):
+        return next((el for el in self.page.elements(tag) if _attrs_match(el, attrs)), None)
+
+    def issue(self, iid, category, severity, **extra):
+        return {"id": iid, "category": category, "severity": severity, "url": self.url, **extra}
+
+@rule('link', scope="page")
+def check_canonical(ctx):
+    if not ctx.can_url:
+        yield ctx.issue("missing_canonical", "indexability", "Medium")
+
+HREFLANG_PAT = re.compile(r'^[a-z]{2}(-[a-zA-Z]{2})?$|x-default', re.IGNORECASE)
+
+@rule('link', scope="page")
+def check_hreflang(ctx):
+    hreflangs = ctx.find_all('link', hreflang=True)
+    if hreflangs:
+        has_x_default = False
+        invalid = []
+        for link in hreflangs:
+            code = link.get('hreflang', '').strip()
+            if code.lower() == 'x-default': has_x_default = True
+            if not HREFLANG_PAT.match(code): invalid.append(code)
+        if invalid:
+            yield ctx.issue("hreflang_invalid", "indexability", "High", args=[", ".join(invalid[:3])])
+        if not has_x_default:
+            yield ctx.issue("hreflang_no_default", "indexability", "Low")
+    elif not ctx.sitemap_has_hreflang and ctx.is_self_canonical:
+        yield ctx.issue("missing_hreflang", "indexability", "Low")
+
+@rule('meta')
+def check_viewport(ctx):
+    if not ctx.find('meta', name='viewport'):
+        yield ctx.issue("missing_viewport", "technical", "Critical")
+
+@rule('script')
+def check_jsonld(ctx):
+    if not ctx.find('script', type='application/ld+json'):
+        path = urlparse(ctx.url).path.lower()
+        rec = "BreadcrumbList"
+        if path in ["/", ""]: rec = "Organization/WebSite"
+        elif any(x in path for x in ["product", "shop"]): rec = "Product"
+        elif any(x in path for x in ["blog", "news"]): rec = "Article"
+        yield ctx.issue("missing_jsonld", "technical", "Medium", args=[rec])
+
+@rule()
+def check_url_format(ctx):
+    if '_' in ctx.url: yield ctx.issue("url_underscore", "technical", "Low")
+    if any(c.isupper() for c in urlparse(ctx.url).path): yield ctx.issue("url_uppercase", "technical", "Medium")
+
+@rule('a')
+def check_js_links(ctx):
+    if any((a.get('href') or '').lower().startswith('javascript:') for a in ctx.find_all('a', href=True)):
+        yield ctx.issue("js_links", "access", "High")
+
+@rule('img')
+def check_images(ctx):
+    missing_alt = 0
+    bad_alt = 0
+    cls_risk = 0
+    for img in ctx.find_all('img'):
+        alt = img.get('alt', '').strip()
+        if not alt: missing_alt += 1
+        elif len(alt) < 3 or any(x in alt.lower() for x in ["image", "photo", "img"]): bad_alt += 1
+        if not img.get('width') or not img.get('height'): cls_risk += 1
+
+    if missing_alt > 0: yield ctx.issue("missing_alt", "image_ux", "Medium")
+    if bad_alt > 0: yield ctx.issue("alt_bad_quality", "image_ux", "Low")
+    if cls_risk > 0: yield ctx.issue("cls_risk", "cwv_performance", "Medium")
+
+@rule('a')
+def check_anchors(ctx):
+    bad_anchors = ["click here", "read more", "more"]
+    if any(a.get_text().strip().lower() in bad_anchors for a in ctx.find_all('a', href=True)):
+        yield ctx.issue("anchor_bad_quality", "access", "Low")
+
+@rule('title')
+def check_title(ctx):
+    if not ctx.title:
+        yield ctx.issue("missing_title", "content", "High")
+    else:
+        px_w = estimate_pixel_width(ctx.title)
+        if px_w < 200:
+            yield ctx.issue("short_title", "content", "Medium", evidence=ctx.title, args=[int(px_w)])
+        elif px_w > 600:
+            yield ctx.issue("long_title", "content", "Low", evidence=ctx.title, args=[int(px_w)])
+
+@rule('meta')
+def check_description(ctx):
+    if not ctx.desc_content:
+        yield ctx.issue("missing_desc", "content", "High")
+    else:
+        px_w_d = estimate_pixel_width(ctx.desc_content)
+        if px_w_d < 400:
+            yield ctx.issue("short_desc", "content", "Low", evidence=ctx.desc_content, args=[int(px_w_d)])
+
+@rule('h1')
+def check_h1(ctx):
+    if not ctx.h1_content: yield ctx.issue("missing_h1", "content", "High")
+
+@rule('title', 'h1')
+def check_soft_404(ctx):
+    if (ctx.title and "not found" in ctx.title.lower()) or (ctx.h1_content and "not found" in ctx.h1_content.lower()):
+        yield ctx.issue("soft_404", "access", "Critical")
+
+@rule('meta', scope="baidu")
+def check_baidu_meta(ctx):
+    keywords = ctx.find('meta', name='keywords')
+    if not keywords or not keywords.get('content', '').strip():
+        yield ctx.issue("missing_keywords", "content", "Medium")
+
+    if "hm.baidu.com" not in ctx.page.html:
+        yield ctx.issue("missing_baidu_stats", "technical", "Low")
+
+    if not ctx.find('meta', name='applicable-device'):
+        yield ctx.issue("missing_applicable_device", "technical", "Medium")
+
+    if not any(m.get('http-equiv', '').lower() == 'cache-control' and 'no-transform' in m.get('content', '').lower() for m in ctx.find_all('meta')):
+        yield ctx.issue("missing_no_transform", "technical", "Medium")
+
+@rule(scope="baidu")
+def check_baidu_text(ctx):
+    page_text = ctx.page.text
+    if "ICP备" not in page_text and "ICP证" not in page_text:
+        yield ctx.issue("missing_icp", "technical", "High")
+
+    chinese_chars = len(re.findall(r'[\u4e00-\u9fa5]', page_text))
+    total_chars = len(page_text.strip())
+    if total_chars > 200 and (chinese_chars / total_chars) < 0.05:
+        yield ctx.issue("content_not_chinese", "content", "Medium")
+
+def analyze_page(url, content, status, sitemap_has_hreflang, baidu_mode=False, rules=None):
+    page = content if isinstance(content, ParsedPage) else ParsedPage(content)
+    rules = RULES if rules is None else rules
+    page.index(set(BASE_TAGS).union(*(r.tags for r in rules)))
+    ctx = PageContext(url, status, page, sitemap_has_hreflang, baidu_mode)
+    issues = []
+
+    title_tag = ctx.find('title')
+    ctx.title = title_tag.string.strip() if title_tag else None
+    desc = ctx.find('meta', name='description')
+    ctx.desc_content = desc['content'].strip() if desc else None
+    h1 = ctx.find('h1')
+    ctx.h1_content = h1.get_text().strip() if h1 else None
+    can_tag = ctx.find('link', rel='canonical')
+    ctx.can_url = can_tag['href'] if can_tag else None
+    hreflang_links = [[l.get('hreflang', '').strip(), urljoin(url, l['href'])] for l in ctx.find_all('link', hreflang=True, href=True)]
+
+    if status == 200:
+        if ctx.can_url:
+            def norm_u(u): return u.split('#')[0].rstrip('/')
+            try:
+                if norm_u(urljoin(url, ctx.can_url)) != norm_u(url):
+                    ctx.is_self_canonical = False
+            except: pass
+
+        for r in rules:
+            if r.scope == "canonical" and not ctx.is_self_canonical: continue
+            if r.scope == "baidu" and not baidu_mode: continue
+            issues.extend(r.check(ctx))
+
+    return {
+        "URL": url, 
+        "Status": status, 
+        "Title": ctx.title, 
+        "Description": ctx.desc_content,
+        "H1": ctx.h1_content,
+        "Canonical": ctx.can_url,
+        "Hreflang": hreflang_links,
+        "Content_Hash": get_content_hash(page.text),
+        "SimHash": format(simhash(page.text), '016x'),
+        "Structure": format(structure_fingerprint(page), '016x')
+    }, issues
+
+def process_page(url, content, status, sitemap_has_hreflang, baidu_mode=False):
+    # 分析子进程入口: 解析一次, 返回页面记录、问题列表与页面内链接
+    page = ParsedPage(content)
+    page_data, issues = analyze_page(url, page, status, sitemap_has_hreflang, baidu_mode)
+    return page_data, issues, page.links()